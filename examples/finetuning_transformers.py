@@ -14,6 +14,7 @@ from transformers import (
 )
 
 from tabgenie import load_dataset
+from tabgenie.utils.sampling import get_length_sorted_indices, restore_order
 
 
 SEED = 42
@@ -73,7 +74,8 @@ def compute_bleu(eval_preds, tokenizer):
 @click.option("--batch-size", "-b", default=16, type=int, help="Number of examples in a batch")
 @click.option("--ckpt-dir", "-c", default=os.path.join(ROOT_DIR, "checkpoints"), type=str, help="Directory to store checkpoints")
 @click.option("--output-dir", "-o", default=os.path.join(ROOT_DIR, "models"), type=str, help="Directory to store models and their outputs")
-def main(dataset, base_model, epochs, batch_size, ckpt_dir, output_dir):
+@click.option("--lazy", is_flag=True, help="Linearize and tokenize the examples on the fly instead of preprocessing the splits")
+def main(dataset, base_model, epochs, batch_size, ckpt_dir, output_dir, lazy):
     os.makedirs(ckpt_dir, exist_ok=True)
     os.makedirs(output_dir, exist_ok=True)
 
@@ -90,14 +92,22 @@ def main(dataset, base_model, epochs, batch_size, ckpt_dir, output_dir):
 
     tg_dataset = load_dataset(dataset)
     hf_datasets = {
-        p: tg_dataset.get_hf_dataset(split=p, tokenizer=tokenizer, max_length=MAX_LENGTH)
+        p: tg_dataset.get_hf_dataset(
+            split=p,
+            tokenizer=tokenizer,
+            max_length=MAX_LENGTH,
+            mode='lazy' if lazy else 'eager',
+            # the lengths are used for grouping the examples of similar lengths into batches to reduce padding
+            with_lengths=not lazy
+        )
         for p in tg_dataset.splits
     }
 
-    # to control if the data fits into the predefined length limit
-    p_truncated_inputs, p_truncated_outputs = calc_truncated(hf_datasets['train'])
-    print(f'Truncated inputs: {p_truncated_inputs}')
-    print(f'Truncated outputs: {p_truncated_outputs}')
+    if not lazy:
+        # to control if the data fits into the predefined length limit
+        p_truncated_inputs, p_truncated_outputs = calc_truncated(hf_datasets['train'])
+        print(f'Truncated inputs: {p_truncated_inputs}')
+        print(f'Truncated outputs: {p_truncated_outputs}')
 
     collator = DataCollatorForSeq2Seq(
         tokenizer,
@@ -123,7 +133,11 @@ def main(dataset, base_model, epochs, batch_size, ckpt_dir, output_dir):
         generation_num_beams=3,
         metric_for_best_model='eval_bleu',
         greater_is_better=True,
-        load_best_model_at_end=True
+        load_best_model_at_end=True,
+        group_by_length=not lazy,
+        length_column_name='input_length',
+        # the lazy datasets need the raw columns for the on-the-fly transform
+        remove_unused_columns=not lazy
     )
 
     trainer = Seq2SeqTrainer(
@@ -145,8 +159,20 @@ def main(dataset, base_model, epochs, batch_size, ckpt_dir, output_dir):
     for part in ['dev', 'test']:
         print(f'Running prediction on {part}')
 
-        preds = trainer.predict(hf_datasets[part])
+        pred_dataset = hf_datasets[part]
+        order = None
+
+        if not lazy:
+            # predicting the examples sorted by length reduces padding, the original order is restored afterwards
+            order = get_length_sorted_indices(pred_dataset['input_length'])
+            pred_dataset = pred_dataset.select(order)
+
+        preds = trainer.predict(pred_dataset)
         decoded_preds = tokenizer.batch_decode(preds.predictions, skip_special_tokens=True)
+
+        if order is not None:
+            decoded_preds = restore_order(decoded_preds, order)
+
         decoded_preds = [{'out': [p]} for p in decoded_preds]
 
         filename = f'{base_model}_{dataset}_{part}'
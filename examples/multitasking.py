@@ -15,6 +15,7 @@ from transformers import (
 )
 
 from tabgenie import load_dataset
+from tabgenie.utils.packing import PACKING_MODEL_TYPES, PackedSeq2SeqCollator, packed_seq2seq_forward
 
 
 SEED = 42
@@ -81,6 +82,19 @@ CUSTOM_LINEARIZE_FNS = {
 }
 
 
+class PackedSeq2SeqTrainer(Seq2SeqTrainer):
+    """
+    Trainer passing the packed training batches to the model by `packed_seq2seq_forward()`
+    """
+
+    def compute_loss(self, model, inputs, return_outputs=False, **kwargs):
+        if 'cross_attention_mask' not in inputs:
+            return super().compute_loss(model, inputs, return_outputs=return_outputs, **kwargs)
+
+        outputs = packed_seq2seq_forward(model, **inputs)
+        return (outputs.loss, outputs) if return_outputs else outputs.loss
+
+
 @click.command()
 @click.option("--datasets", "-d", required=True, type=str, help="Datasets to train on")
 @click.option("--base-model", "-m", default="t5-small", type=str, help="Base model to finetune")
@@ -88,11 +102,12 @@ CUSTOM_LINEARIZE_FNS = {
 @click.option("--batch-size", "-b", default=16, type=int, help="Path to the output directory")
 @click.option("--ckpt-dir", "-c", default=os.path.join(ROOT_DIR, "checkpoints"), type=str, help="Directory to store checkpoints")
 @click.option("--output-dir", "-o", default=os.path.join(ROOT_DIR, "models"), type=str, help="Directory to store models and their outputs")
-def main(datasets, base_model, epochs, batch_size, ckpt_dir, output_dir):
+@click.option("--packing", is_flag=True, help="Pack the training examples into sequences of up to MAX_LENGTH tokens (T5 models only)")
+def main(datasets, base_model, epochs, batch_size, ckpt_dir, output_dir, packing):
     os.makedirs(ckpt_dir, exist_ok=True)
     os.makedirs(output_dir, exist_ok=True)
 
-    model_name = f'{base_model.rsplit("/", 1)[-1]}_{datasets}_{epochs}e_{batch_size}bs'
+    model_name = f'{base_model.rsplit("/", 1)[-1]}_{datasets}_{epochs}e_{batch_size}bs{"_packed" if packing else ""}'
     print(f'Fine-tuning {model_name}')
 
     save_dir = os.path.join(output_dir, model_name)
@@ -103,6 +118,9 @@ def main(datasets, base_model, epochs, batch_size, ckpt_dir, output_dir):
     model = AutoModelForSeq2SeqLM.from_pretrained(base_model)
     tokenizer = AutoTokenizer.from_pretrained(base_model)
 
+    if packing and model.config.model_type not in PACKING_MODEL_TYPES:
+        raise click.BadParameter(f'packing is supported only for the model types {PACKING_MODEL_TYPES}', param_hint='--packing')
+
     datasets = [x.strip() for x in datasets.split(',')]
     hf_datasets = {}
 
@@ -120,7 +138,9 @@ def main(datasets, base_model, epochs, batch_size, ckpt_dir, output_dir):
                 tokenizer=tokenizer,
                 max_length=MAX_LENGTH,
                 linearize_fn=table_to_linear_with_prefix,
-                linearize_params=prefix_lin_params
+                linearize_params=prefix_lin_params,
+                # the dev and test examples are evaluated with generation, only the training examples are packed
+                packing=packing and p == 'train'
             )
             for p in tg_dataset.splits
         }
@@ -138,13 +158,26 @@ def main(datasets, base_model, epochs, batch_size, ckpt_dir, output_dir):
         label_pad_token_id=LABEL_PAD_TOKEN_ID
     )
 
+    data_collator = collator
+
+    if packing:
+        packed_collator = PackedSeq2SeqCollator(
+            pad_token_id=tokenizer.pad_token_id,
+            decoder_start_token_id=model.config.decoder_start_token_id,
+            label_pad_token_id=LABEL_PAD_TOKEN_ID
+        )
+
+        def data_collator(features):
+            # packed training batches, unpacked evaluation batches
+            return packed_collator(features) if 'segment_ids' in features[0] else collator(features)
+
     def compute_dev_metrics(eval_preds):
         return compute_bleu(eval_preds, tokenizer)
 
     training_args = Seq2SeqTrainingArguments(
         output_dir=os.path.join(ckpt_dir, model_name),
         report_to='none',
-        evaluation_strategy='epoch',
+        eval_strategy='epoch',
         per_device_train_batch_size=batch_size,
         per_device_eval_batch_size=batch_size,
         learning_rate=1e-4,
@@ -156,16 +189,18 @@ def main(datasets, base_model, epochs, batch_size, ckpt_dir, output_dir):
         generation_num_beams=3,
         metric_for_best_model='eval_bleu',
         greater_is_better=True,
-        load_best_model_at_end=True
+        load_best_model_at_end=True,
+        # the packed examples have no attention masks, these are built by the collator from the segment columns
+        remove_unused_columns=not packing
     )
 
-    trainer = Seq2SeqTrainer(
+    trainer = PackedSeq2SeqTrainer(
         model=model,
         args=training_args,
         train_dataset=joint_train,
         eval_dataset=joint_dev,
-        tokenizer=tokenizer,
-        data_collator=collator,
+        processing_class=tokenizer,
+        data_collator=data_collator,
         compute_metrics=compute_dev_metrics,
         callbacks=[
             EarlyStoppingCallback(early_stopping_patience=PATIENCE)
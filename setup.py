@@ -6,6 +6,8 @@ project_root = Path(__file__).parent
 install_requires = [
     "Flask>=2.2.2",
     "datasets>=2.9.0",
+    "numpy",
+    "pyarrow",
     "requests",
     "lxml",
     "tinyhtml",
@@ -46,6 +48,9 @@ setup(
         "deploy": [
             "gunicorn",
         ],
+        "zstd": [
+            "zstandard",
+        ],
     },
     classifiers=[
         "Development Status :: 3 - Alpha",
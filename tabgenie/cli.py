@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 import click
+import codecs
 import os
 import logging
 from flask.cli import FlaskGroup, with_appcontext, pass_script_info
@@ -60,14 +61,14 @@ def run():
     "--export_format",
     "-f",
     required=True,
-    type=click.Choice(["json", "csv", "xlsx", "html", "txt"]),
+    type=click.Choice(["json", "csv", "xlsx", "html", "txt", "parquet", "arrow"]),
     help="Output file format",
 )
 @click.option(
     "--linearization_style",
     "-l",
     type=click.Choice(["index", "markers", "2d"]),
-    help="Linearization format for TXT export",
+    help="Linearization format for TXT export (for Parquet / Arrow export, all formats are included by default)",
 )
 @click.option("--include_props", "-p", type=bool, is_flag=True, default=False, help="Include properties in the output")
 @click.option(
@@ -77,8 +78,75 @@ def run():
     type=int,
     help="Table ID to export (can be specified multiple times), all tables are exported by default",
 )
+@click.option(
+    "--disk_cache_dir",
+    "-c",
+    type=str,
+    default=None,
+    help="Directory for the persistent cache of prepared tables (reused by subsequent exports)",
+)
+@click.option(
+    "--single_file",
+    is_flag=True,
+    default=False,
+    help="Write all the tables into a single file (JSONL for json, a single workbook for xlsx, "
+    "tables separated by --delimiter otherwise)",
+)
+@click.option(
+    "--compression",
+    type=click.Choice(["gzip", "zstd"]),
+    default=None,
+    help="Compression of the single output file (zstd requires the `zstandard` package)",
+)
+@click.option(
+    "--delimiter",
+    type=str,
+    default="\\n\\n",
+    help="Delimiter between the tables in the single output file (escape sequences are interpreted)",
+)
+@click.option(
+    "--workers",
+    "-w",
+    type=click.IntRange(min=1),
+    default=1,
+    help="Number of processes exporting the tables in parallel",
+)
+@click.option(
+    "--xlsx_layout",
+    type=click.Choice(["sheets", "stacked"]),
+    default="sheets",
+    help="Layout of the single xlsx file: a sheet per table, or all tables on one sheet with an index sheet",
+)
+@click.option(
+    "--no_resume",
+    is_flag=True,
+    default=False,
+    help="Do not record the progress in a manifest and do not resume an interrupted export",
+)
+@click.option(
+    "--chunk_size",
+    type=click.IntRange(min=1),
+    default=5000,
+    help="Number of tables in a chunk of the resumable export",
+)
 @with_appcontext
-def export(dataset, split, out_dir, export_format, linearization_style, include_props, table_id):
+def export(
+    dataset,
+    split,
+    out_dir,
+    export_format,
+    linearization_style,
+    include_props,
+    table_id,
+    disk_cache_dir,
+    single_file,
+    compression,
+    delimiter,
+    workers,
+    xlsx_layout,
+    no_resume,
+    chunk_size,
+):
     """Export input tables to a specified format."""
     from .main import export_dataset
 
@@ -86,6 +154,14 @@ def export(dataset, split, out_dir, export_format, linearization_style, include_
         logger.error('For export to txt, --linearization_style (-l) parameter is required.')
         return
 
+    if compression is not None and export_format == "xlsx":
+        logger.error("Compression (--compression) is not supported for xlsx.")
+        return
+
+    if compression is not None and not single_file:
+        logger.error("Compression (--compression) can be used only with --single_file.")
+        return
+
     export_dataset(
         dataset_name=dataset,
         split=split,
@@ -94,6 +170,14 @@ def export(dataset, split, out_dir, export_format, linearization_style, include_
         linearization_style=linearization_style,
         include_props=include_props,
         table_ids=table_id,
+        disk_cache_dir=disk_cache_dir,
+        single_file=single_file,
+        compression=compression,
+        delimiter=codecs.decode(delimiter, "unicode_escape"),
+        workers=workers,
+        xlsx_layout=xlsx_layout,
+        resume=not no_resume,
+        chunk_size=chunk_size,
     )
 
 
@@ -17,10 +17,14 @@ class CACAPO(HFTabularDataset):
         super().__init__(*args, **kwargs)
         self.hf_id = "kasnerz/cacapo"
         self.name = "CACAPO"
+        self.reference_columns = ["lex"]
+
+    def get_entry_reference(self, entry):
+        return ast.literal_eval(entry["lex"]["text"][0])[0]
 
     def prepare_table(self, entry):
         t = Table()
-        t.props["reference"] = ast.literal_eval(entry["lex"]["text"][0])[0]
+        t.props["reference"] = self.get_entry_reference(entry)
         t.props["category"] = entry["category"]
         t.props["lang"] = entry["lang"]
         keyvals = entry["modified_triple_sets"]["mtriple_set"][0]
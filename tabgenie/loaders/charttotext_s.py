@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 import ast
 
-from ..structs.data import Cell, Table, HFTabularDataset
+from ..structs.data import Cell, HFTabularDataset
 
 
 class ChartToTextS(HFTabularDataset):
@@ -14,12 +14,13 @@ class ChartToTextS(HFTabularDataset):
         self.table_content = {}
         self.hf_id = "kasnerz/charttotext-s"
         self.name = "Chart-to-Text (Statista subset)"
+        self.reference_column = "ref"
 
-    def prepare_table(self, entry):
-        t = Table()
-        t.props["reference"] = entry["ref"]
+    def prepare_props(self, t, entry):
+        t.props["reference"] = self.get_entry_reference(entry)
         t.props["title"] = entry["title"]
 
+    def prepare_cells(self, t, entry):
         for i, row in enumerate(ast.literal_eval(entry["content"])):
             for j, col in enumerate(row):
                 c = Cell()
@@ -28,5 +29,3 @@ class ChartToTextS(HFTabularDataset):
                     c.is_col_header = True
                 t.add_cell(c)
             t.save_row()
-
-        return t
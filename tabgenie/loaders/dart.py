@@ -16,6 +16,7 @@ class DART(HFTabularDataset):
         super().__init__(*args, **kwargs)
         self.hf_id = "GEM/dart"
         self.name = "DART"
+        self.reference_column = "target"
         self.extra_info = {"license": "MIT", "homepage": "https://github.com/Yale-LILY/dart"}
 
     def get_task_definition(self):
@@ -36,7 +37,7 @@ class DART(HFTabularDataset):
     def prepare_table(self, entry):
         t = Table()
 
-        t.props["reference"] = entry["target"]
+        t.props["reference"] = self.get_entry_reference(entry)
         t.props["target_source"] = entry["target_sources"][0]
         t.props["subtree_was_extended"] = entry["subtree_was_extended"]
 
@@ -12,6 +12,7 @@ class E2E(HFTabularDataset):
         super().__init__(*args, **kwargs)
         self.hf_id = "GEM/e2e_nlg"
         self.name = "E2E"
+        self.reference_column = "target"
         self.license = "CC BY-SA 4.0"
 
     def table_to_triples(self, table, cell_ids):
@@ -55,7 +56,7 @@ class E2E(HFTabularDataset):
 
     def prepare_table(self, entry):
         t = Table()
-        t.props["reference"] = entry["target"]
+        t.props["reference"] = self.get_entry_reference(entry)
         mrs = entry["meaning_representation"].split(", ")
 
         for mr in mrs:
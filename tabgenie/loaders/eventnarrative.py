@@ -17,6 +17,7 @@ class EventNarrative(HFTabularDataset):
         super().__init__(*args, **kwargs)
         self.hf_id = "kasnerz/eventnarrative"
         self.name = "EventNarrative"
+        self.reference_columns = ["narration", "entity_ref_dict"]
 
     def table_to_triples(self, table, cell_ids):
         triples = []
@@ -30,14 +31,17 @@ class EventNarrative(HFTabularDataset):
 
         return triples
 
-    def prepare_table(self, entry):
+    def get_entry_reference(self, entry):
         reference = entry["narration"]
 
         for key, val in ast.literal_eval(entry["entity_ref_dict"]).items():
             reference = reference.replace(key, val)
 
+        return reference
+
+    def prepare_table(self, entry):
         t = Table()
-        t.props["reference"] = reference
+        t.props["reference"] = self.get_entry_reference(entry)
         t.props["title"] = entry["Event_Name"]
         t.props["types"] = entry["types"]
         t.props["reference_delex"] = entry["narration"]
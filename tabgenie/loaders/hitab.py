@@ -10,6 +10,7 @@ class HiTab(HFTabularDataset):
         super().__init__(*args, **kwargs)
         self.hf_id = "kasnerz/hitab"
         self.name = "HiTab"
+        self.reference_column = "sub_sentence"
 
     @staticmethod
     def _get_linked_cells(linked_cells):
@@ -39,7 +40,7 @@ class HiTab(HFTabularDataset):
 
     def prepare_table(self, entry):
         t = Table()
-        t.props["reference"] = entry["sub_sentence"]
+        t.props["reference"] = self.get_entry_reference(entry)
         content = ast.literal_eval(entry["table_content"])
         linked_cells = self._get_linked_cells(ast.literal_eval(entry["linked_cells"]))
 
@@ -14,6 +14,7 @@ class Logic2Text(HFTabularDataset):
         super().__init__(*args, **kwargs)
         self.hf_id = "kasnerz/logic2text"
         self.name = "Logic2Text"
+        self.reference_column = "sent"
 
     def prepare_table(self, entry):
         def is_highlighted(i, j):
@@ -52,7 +53,7 @@ class Logic2Text(HFTabularDataset):
         entry["annotation"] = ast.literal_eval(entry["annotation"])
 
         t = Table()
-        t.props["reference"] = entry["sent"]
+        t.props["reference"] = self.get_entry_reference(entry)
 
         t.props["title"] = entry["topic"]
         t.props["url"] = entry["url"]
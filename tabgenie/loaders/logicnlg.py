@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 import ast
 
-from ..structs.data import Cell, Table, HFTabularDataset
+from ..structs.data import Cell, HFTabularDataset
 
 
 class LogicNLG(HFTabularDataset):
@@ -16,16 +16,16 @@ class LogicNLG(HFTabularDataset):
         self.mapping = {}
         self.hf_id = "kasnerz/logicnlg"
         self.name = "LogicNLG"
+        self.reference_column = "ref"
 
-    def prepare_table(self, entry):
-        t = Table()
-
-        t.props["reference"] = entry["ref"]
+    def prepare_props(self, t, entry):
+        t.props["reference"] = self.get_entry_reference(entry)
         t.props["title"] = entry["title"]
         t.props["table_id"] = entry["table_id"]
         t.props["template"] = entry["template"]
         t.props["linked_columns"] = entry["linked_columns"]
 
+    def prepare_cells(self, t, entry):
         for i, row in enumerate(ast.literal_eval(entry["table"])):
             for j, x in enumerate(row):
                 c = Cell()
@@ -35,5 +35,3 @@ class LogicNLG(HFTabularDataset):
                     c.is_col_header = True
                 t.add_cell(c)
             t.save_row()
-
-        return t
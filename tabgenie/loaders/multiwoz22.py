@@ -283,6 +283,11 @@ class MultiWOZ22(HFTabularDataset):
         super().__init__(*args, **kwargs)
         self.hf_id = "multi_woz_v22"
         self.name = "MultiWOZ_2.2 ref: User Goal"
+        self.reference_columns = ["turns"]
+
+    def get_entry_reference(self, entry):
+        dialogue_acts = list(dai2tuples(just_user_acts(entry["turns"])))
+        return list(generate_natural_user_prompt(dialogue_acts))
 
     def prepare_table(self, entry):
         t = Table()
@@ -294,8 +299,7 @@ class MultiWOZ22(HFTabularDataset):
         t.props["title"] = "Instructions to user"
 
         turns = entry["turns"]
-        dialogue_acts = list(dai2tuples(just_user_acts(turns)))
-        t.props["reference"] = list(generate_natural_user_prompt(dialogue_acts))
+        t.props["reference"] = self.get_entry_reference(entry)
 
         col_names = ["turn_id", "speaker", "utterance", "frames", "dialogue_acts"]
         display_cols = ["turn_id", "speaker", "utterance"]
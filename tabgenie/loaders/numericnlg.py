@@ -1,7 +1,7 @@
 #!/usr/bin/env python3
 import ast
 
-from ..structs.data import Cell, Table, HFTabularDataset
+from ..structs.data import Cell, HFTabularDataset
 
 
 class NumericNLG(HFTabularDataset):
@@ -13,10 +13,10 @@ class NumericNLG(HFTabularDataset):
         super().__init__(*args, **kwargs)
         self.hf_id = "kasnerz/numericnlg"
         self.name = "NumericNLG"
+        self.reference_column = "description"
 
-    def prepare_table(self, entry):
-        t = Table()
-        t.props["reference"] = entry["description"]
+    def prepare_props(self, t, entry):
+        t.props["reference"] = self.get_entry_reference(entry)
         t.props["header_mention"] = entry["header_mention"]
         t.props["class_sentence"] = entry["header_mention"]
         t.props["table_id_paper"] = entry.get("table_id_paper")
@@ -31,7 +31,7 @@ class NumericNLG(HFTabularDataset):
         t.props["target_entity"] = str(entry.get("target_entity") or "")
         t.props["valid"] = entry.get("valid")
 
-
+    def prepare_cells(self, t, entry):
         for i in range(int(entry["column_header_level"])):
             c = Cell("")
             c.colspan = int(entry["row_header_level"])
@@ -61,5 +61,3 @@ class NumericNLG(HFTabularDataset):
                 c = Cell(x)
                 t.add_cell(c)
             t.save_row()
-
-        return t
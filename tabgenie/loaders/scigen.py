@@ -4,7 +4,7 @@ import ast
 
 from tinyhtml import h
 
-from ..structs.data import Cell, Table, HFTabularDataset
+from ..structs.data import Cell, HFTabularDataset
 
 
 class SciGen(HFTabularDataset):
@@ -12,6 +12,7 @@ class SciGen(HFTabularDataset):
         super().__init__(*args, **kwargs)
         self.hf_id = "kasnerz/scigen"
         self.name = "SciGen"
+        self.reference_columns = ["text"]
 
     def normalize(self, s, is_header=False):
         # just ignore inline tags and italics
@@ -27,13 +28,16 @@ class SciGen(HFTabularDataset):
 
         return s
 
-    def prepare_table(self, entry):
-        t = Table()
-        t.props["reference"] = (entry.get("text") or "").replace("[CONTINUE]", "\n")
+    def get_entry_reference(self, entry):
+        return (entry.get("text") or "").replace("[CONTINUE]", "\n")
+
+    def prepare_props(self, t, entry):
+        t.props["reference"] = self.get_entry_reference(entry)
         t.props["title"] = entry["table_caption"].replace("[CONTINUE]", "\n")
         t.props["paper"] = entry["paper"]
         t.props["paper_id"] = entry.get("paper_id")
 
+    def prepare_cells(self, t, entry):
         for col in ast.literal_eval(entry["table_column_names"]):
             c = Cell()
             c.value = self.normalize(col, is_header=True)
@@ -48,5 +52,3 @@ class SciGen(HFTabularDataset):
                 c.value = self.normalize(col)
                 t.add_cell(c)
             t.save_row()
-
-        return t
@@ -1,5 +1,5 @@
 #!/usr/bin/env python3
-from ..structs.data import Cell, Table, HFTabularDataset
+from ..structs.data import Cell, HFTabularDataset
 
 
 class SportSettBasketball(HFTabularDataset):
@@ -13,6 +13,7 @@ class SportSettBasketball(HFTabularDataset):
         super().__init__(*args, **kwargs)
         self.hf_id = "GEM/sportsett_basketball"
         self.name = "SportSett Basketball"
+        self.reference_column = "target"
         self.extra_info = {"license": "MIT"}
 
     def _next_game_to_str(self, ng):
@@ -21,9 +22,8 @@ class SportSettBasketball(HFTabularDataset):
 
         return f"{ng['dayname']} {ng['day']} {ng['month']} {ng['year']}, {ng['opponent_place']} {ng['opponent_name']}, {ng['stadium']}, {ng['city']}"
 
-    def prepare_table(self, entry):
-        t = Table()
-        t.props["reference"] = entry["target"]
+    def prepare_props(self, t, entry):
+        t.props["reference"] = self.get_entry_reference(entry)
 
         ht = entry["teams"]["home"]
         vt = entry["teams"]["vis"]
@@ -53,6 +53,7 @@ class SportSettBasketball(HFTabularDataset):
         for key, val in entry["game"].items():
             t.props[key] = val
 
+    def prepare_cells(self, t, entry):
         stat_headers = [
             "AST",
             "BLK",
@@ -147,5 +148,3 @@ class SportSettBasketball(HFTabularDataset):
                         t.add_cell(c)
 
                     t.save_row()
-
-        return t
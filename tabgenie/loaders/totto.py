@@ -1,5 +1,5 @@
 #!/usr/bin/env python3
-from ..structs.data import Cell, Table, HFTabularDataset
+from ..structs.data import Cell, HFTabularDataset
 
 
 class ToTTo(HFTabularDataset):
@@ -13,6 +13,7 @@ class ToTTo(HFTabularDataset):
         super().__init__(*args, **kwargs)
         self.hf_id = "GEM/totto"
         self.name = "ToTTo"
+        self.reference_column = "target"
         self.extra_info = {
             "license": "CC BY-SA 3.0",
             "changes": (
@@ -134,9 +135,8 @@ class ToTTo(HFTabularDataset):
 
         return table_obj
 
-    def prepare_table(self, entry):
-        t = Table()
-        t.props["reference"] = entry["target"]
+    def prepare_props(self, t, entry):
+        t.props["reference"] = self.get_entry_reference(entry)
 
         t.props["title"] = entry["table_page_title"]
         if entry.get("table_section_text"):
@@ -150,7 +150,6 @@ class ToTTo(HFTabularDataset):
         t.props["overlap_subset"] = entry["overlap_subset"]
         t.props["url"] = entry["table_webpage_url"]
 
-        t = self._write_cells(t, entry)
-        t = self._add_header_highlights(t)
-
-        return t
+    def prepare_cells(self, t, entry):
+        self._write_cells(t, entry)
+        self._add_header_highlights(t)
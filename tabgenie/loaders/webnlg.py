@@ -18,6 +18,7 @@ class WebNLG(HFTabularDataset):
         self.hf_id = "GEM/web_nlg"
         self.hf_extra_config = "en"
         self.name = "WebNLG"
+        self.reference_column = "target"
         self.extra_info = {"version": "3.0", "license": "CC BY-NC 4.0"}
 
     def table_to_triples(self, table, cell_ids):
@@ -34,7 +35,7 @@ class WebNLG(HFTabularDataset):
 
     def prepare_table(self, entry):
         t = Table()
-        t.props["reference"] = entry["target"]
+        t.props["reference"] = self.get_entry_reference(entry)
         t.props["category"] = entry["category"]
         t.props["webnlg_id"] = entry["webnlg_id"]
 
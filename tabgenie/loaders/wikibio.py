@@ -1,5 +1,5 @@
 #!/usr/bin/env python3
-from ..structs.data import Cell, Table, HFTabularDataset
+from ..structs.data import Cell, HFTabularDataset
 
 # from ..utils.text import Detokenizer
 
@@ -13,6 +13,7 @@ class WikiBio(HFTabularDataset):
         super().__init__(*args, **kwargs)
         self.hf_id = "wiki_bio"
         self.name = "WikiBio"
+        self.reference_column = "target_text"
         self.mapping = {}
         self.split_mapping = {"train": "train", "dev": "val", "test": "test"}
 
@@ -20,10 +21,11 @@ class WikiBio(HFTabularDataset):
     def normalize(s):
         return s.replace("-lrb-", "(").replace("-rrb-", ")")
 
-    def prepare_table(self, entry):
-        t = Table()
-        t.props["reference"] = entry["target_text"]
+    def prepare_props(self, t, entry):
+        t.props["reference"] = self.get_entry_reference(entry)
         t.props["title"] = self.normalize(entry["input_text"]["context"].rstrip("\n"))
+
+    def prepare_cells(self, t, entry):
         table = entry["input_text"]["table"]
 
         for key, val in zip(table["column_header"], table["content"]):
@@ -37,5 +39,3 @@ class WikiBio(HFTabularDataset):
             t.add_cell(c)
 
             t.save_row()
-
-        return t
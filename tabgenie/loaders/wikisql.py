@@ -1,5 +1,5 @@
 #!/usr/bin/env python3
-from ..structs.data import Cell, Table, HFTabularDataset
+from ..structs.data import Cell, HFTabularDataset
 
 
 class WikiSQL(HFTabularDataset):
@@ -16,6 +16,7 @@ class WikiSQL(HFTabularDataset):
         self.mapping = {}
         self.hf_id = "wikisql"
         self.name = "WikiSQL"
+        self.reference_column = "question"
         self.extra_info = {"license": "BSD 3-Clause"}
 
     @staticmethod
@@ -26,18 +27,17 @@ class WikiSQL(HFTabularDataset):
             if value:
                 return value
 
-    def prepare_table(self, entry):
-        t = Table()
-
+    def prepare_props(self, t, entry):
         title = self._get_title(entry["table"])
         if title is not None:
             t.props["title"] = title
 
         t.props["sql"] = entry["sql"]["human_readable"]
-        t.props["reference"] = entry["question"]
+        t.props["reference"] = self.get_entry_reference(entry)
         t.props["id"] = entry["table"]["id"]
         t.props["name"] = entry["table"]["name"]
 
+    def prepare_cells(self, t, entry):
         for header_cell in entry["table"]["header"]:
             c = Cell()
             c.value = header_cell
@@ -51,5 +51,3 @@ class WikiSQL(HFTabularDataset):
                 c.value = cell
                 t.add_cell(c)
             t.save_row()
-
-        return t
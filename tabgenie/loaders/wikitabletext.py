@@ -12,10 +12,11 @@ class WikiTableText(HFTabularDataset):
         super().__init__(*args, **kwargs)
         self.hf_id = "kasnerz/wikitabletext"
         self.name = "WikiTableText"
+        self.reference_column = "reference"
 
     def prepare_table(self, entry):
         t = Table()
-        t.props["reference"] = entry["reference"]
+        t.props["reference"] = self.get_entry_reference(entry)
         t.props["row_number"] = entry["row_number"]
 
         headers = ast.literal_eval(entry["headers"])
@@ -1,24 +1,32 @@
 #!/usr/bin/env python3
+import io
 import os
 import json
 import glob
-import shutil
+import gzip
+import hashlib
+import itertools
 import logging
 import linecache
 import pandas as pd
 import random
 import coloredlogs
 import yaml
+import zipfile
 from xlsxwriter import Workbook
-from flask import Flask, render_template, jsonify, request, send_file, session
+from flask import Flask, Response, render_template, jsonify, request, send_file, session, stream_with_context
 
 from .loaders import DATASET_CLASSES
 from .processing.processing import get_pipeline_class_by_name
-from .utils.excel import write_html_table_to_excel, write_annotation_to_excel
+from .utils.columnar_export import COLUMNAR_FORMATS
+from .utils.manifest import ExportManifest, checksum_file_range, checksum_files
+from .utils.export import workbook_to_bytes
+from .utils.excel import write_html_table_to_excel, write_annotation_to_excel, write_tables_to_excel
 
 
 TEMPLATES_DIR = os.path.join(os.path.dirname(__file__), "templates")
 STATIC_DIR = os.path.join(os.path.dirname(__file__), "static")
+COMPRESSION_EXTENSIONS = {"gzip": ".gz", "zstd": ".zst"}
 
 
 app = Flask("tabgenie", template_folder=TEMPLATES_DIR, static_folder=STATIC_DIR)
@@ -124,36 +132,83 @@ def export_to_file():
     edited_cells = json.loads(content.get("edited_cells", "{}"))
     export_notes = content["export_notes"]
 
-    export_dir = os.path.join(app.config["root_dir"], "tmp")
-
-    if os.path.isdir(export_dir):
-        shutil.rmtree(export_dir)
-
-    os.makedirs(os.path.join(export_dir, "files"))
+    if type(export_examples) is dict:
+        # favourites / notes
+        export_examples = list(export_examples.values())
 
     notes = session.get("notes", {})
-    logging.warning(f"{export_examples=}  {notes=}")
-    file_to_download = export_examples_to_file(
-        export_examples,
-        export_dir=os.path.join(export_dir, "files"),
-        export_format=export_format,
-        linearization_style=linearization_style,
-        include_props=include_props,
-        edited_cells=edited_cells,
-        notes=session.get("notes", {}),
+    pipeline_args = get_export_pipeline_args(
+        export_examples, export_format, linearization_style, include_props, edited_cells
     )
-    if export_notes is True:
-        export_notes_to_file(notes, export_dir=os.path.join(export_dir, "files"))
+    exported = iter_pipeline("export", pipeline_args=pipeline_args)
 
     if export_option in ["favourites", "notes"]:
-        file_to_download = os.path.join(export_dir, "export.zip")
-        shutil.make_archive(file_to_download.rsplit(".", 1)[0], "zip", os.path.join(export_dir, "files"))
+        # the files are exported one by one and written straight into the streamed zip archive
+        extra_files = {"notes.csv": notes_to_csv(notes)} if export_notes is True else {}
+        zip_stream = iter_zip_stream(
+            ((get_table_file_name(e, export_format), get_exported_table_bytes(t, export_format)) for e, t in exported),
+            extra_files=extra_files,
+        )
+        logger.info("Sending file")
+        return Response(
+            stream_with_context(zip_stream),
+            mimetype="application/zip",
+            headers={"Content-Disposition": "attachment; filename=export.zip"},
+        )
+
+    e, exported_table = next(exported)
 
     logger.info("Sending file")
-    return send_file(file_to_download, mimetype="text/plain", as_attachment=True)
+    return send_file(
+        io.BytesIO(get_exported_table_bytes(exported_table, export_format)),
+        mimetype="text/plain",
+        as_attachment=True,
+        download_name=get_table_file_name(e, export_format),
+    )
 
 
-def export_notes_to_file(notes, export_dir):
+class ZipStream(io.RawIOBase):
+    """
+    Unseekable write-only stream collecting the data written by `zipfile.ZipFile`,
+    the data are taken out with `drain()` after each file added to the archive.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def iter_zip_stream(files, extra_files=None):
+    """
+    Generate a zip archive with the (filename, bytes) pairs from `files`, yielding the archive data
+    as the files are added, so that the archive is never held in memory or written to the disk.
+    """
+    stream = ZipStream()
+
+    with zipfile.ZipFile(stream, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for filename, data in files:
+            zf.writestr(filename, data)
+            yield stream.drain()
+
+        for filename, data in (extra_files or {}).items():
+            zf.writestr(filename, data)
+
+    yield stream.drain()
+
+
+def notes_to_csv(notes):
     csv_data = []
     headers = ["dataset", "split", "table_idx", "note"]
     csv_data.append(headers)
@@ -162,19 +217,19 @@ def export_notes_to_file(notes, export_dir):
         csv_data.append([note["dataset"], note["split"], note["table_idx"], note["note"]])
 
     df = pd.DataFrame(csv_data[1:], columns=csv_data[0])
-    csv_file = os.path.join(export_dir, "notes.csv")
 
-    df.to_csv(csv_file, index=False)
+    return df.to_csv(index=False)
 
 
-def export_examples_to_file(
-    examples_to_export, export_format, linearization_style, export_dir, include_props, edited_cells, notes=None
-):
-    if type(examples_to_export) is dict:
-        # favourites / notes
-        examples_to_export = examples_to_export.values()
+def export_notes_to_file(notes, export_dir):
+    csv_file = os.path.join(export_dir, "notes.csv")
+
+    with open(csv_file, "w") as f:
+        f.write(notes_to_csv(notes))
+
 
-    pipeline_args = {
+def get_export_pipeline_args(examples_to_export, export_format, linearization_style, include_props, edited_cells):
+    return {
         "examples_to_export": examples_to_export,
         "export_format": export_format,
         "linearization_style": linearization_style,
@@ -185,8 +240,64 @@ def export_examples_to_file(
             for dataset_name, split in map(lambda x: (x["dataset"], x["split"]), examples_to_export)
         },
     }
+
+
+def export_examples_to_file(
+    examples_to_export,
+    export_format,
+    linearization_style,
+    export_dir,
+    include_props,
+    edited_cells,
+    notes=None,
+    single_file=False,
+    compression=None,
+    delimiter="\n\n",
+    workers=1,
+    xlsx_layout="sheets",
+    append=False,
+):
+    """
+    Export the examples to `export_dir`, either one file per table or (with `single_file`) all the tables
+    into a single JSONL file (JSON export), a single workbook (xlsx export, see `write_tables_to_excel()`
+    for the layouts) or a single text file with the tables separated by `delimiter`.
+    The single file can be compressed with `gzip` or `zstd`. The tables are exported by `workers` processes
+    (except for the single workbook, which is written sequentially). With `append`, the tables are appended
+    to the existing single file.
+    """
+    if type(examples_to_export) is dict:
+        # favourites / notes
+        examples_to_export = list(examples_to_export.values())
+
+    if single_file and export_format == "xlsx" and compression is not None:
+        raise ValueError("The xlsx files cannot be compressed")
+
+    pipeline_args = get_export_pipeline_args(
+        examples_to_export, export_format, linearization_style, include_props, edited_cells
+    )
     os.makedirs(export_dir, exist_ok=True)
-    exported = run_pipeline("export", pipeline_args=pipeline_args, force=True)
+
+    if single_file and export_format == "xlsx":
+        out_path = os.path.join(export_dir, get_single_file_name(examples_to_export, export_format))
+        tables = app.db["pipelines_obj"]["export"].iter_tables(pipeline_args)
+        tables = ((f"{e['dataset']}_{e['split']}_{e['table_idx']}", table) for e, table in tables)
+        write_tables_to_excel(tables, out_path, layout=xlsx_layout, write_table_props=include_props)
+
+        return out_path
+
+    exported = iter_pipeline("export", pipeline_args=pipeline_args, workers=workers)
+
+    if single_file:
+        out_filename = get_single_file_name(examples_to_export, export_format, compression)
+        return write_exported_tables_to_single_file(
+            exported,
+            export_format,
+            export_dir,
+            out_filename,
+            compression=compression,
+            delimiter=delimiter,
+            append=append,
+        )
 
     # ZK: commented this block out for now
     # for now, the notes can be exported in a ZIP file alongside other files
@@ -210,48 +321,281 @@ def export_examples_to_file(
     # write_annotation_to_excel(tables, prop_list, ann_columns, os.path.join(export_dir, out_filename))
     # ========================
 
-    for e, exported_table in zip(examples_to_export, exported):
-        out_filename = f"{e['dataset']}_{e['split']}_tab_{e['table_idx']}.{export_format}"
+    return write_exported_tables_to_files(exported, export_format, export_dir)
+
+
+def get_table_file_name(example, export_format):
+    return f"{example['dataset']}_{example['split']}_tab_{example['table_idx']}.{export_format}"
+
+
+def get_single_file_name(examples_to_export, export_format, compression=None):
+    sources = set((e["dataset"], e["split"]) for e in examples_to_export)
+    name = "_".join(sources.pop()) if len(sources) == 1 else "export"
+    extension = "jsonl" if export_format == "json" else export_format
+
+    if compression is not None:
+        extension += COMPRESSION_EXTENSIONS[compression]
+
+    return f"{name}.{extension}"
+
+
+def open_export_file(path, compression=None, mode="w"):
+    # with mode="a", the compressed data is appended as a new gzip member / zstd frame
+    if compression is None:
+        return open(path, mode)
+    elif compression == "gzip":
+        return gzip.open(path, mode + "t")
+    elif compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("The zstd compression requires the `zstandard` package (pip install zstandard)")
+
+        return zstandard.open(path, mode + "t")
+    else:
+        raise ValueError(f"Unknown compression: {compression}, available options: {list(COMPRESSION_EXTENSIONS)}")
+
+
+def write_exported_tables_to_single_file(
+    exported, export_format, export_dir, out_filename, compression=None, delimiter="\n\n", append=False
+):
+    """
+    Write the (example, exported table) pairs to a single file as they are produced.
+    With `append`, the tables are appended after the tables already in the file.
+    """
+    out_path = os.path.join(export_dir, out_filename)
+
+    with open_export_file(out_path, compression, mode="a" if append else "w") as f:
+        for i, (e, exported_table) in enumerate(exported):
+            if export_format == "json":
+                record = {"dataset": e["dataset"], "split": e["split"], "table_idx": e["table_idx"], **exported_table}
+                f.write(json.dumps(record) + "\n")
+            else:
+                if i > 0 or append:
+                    f.write(delimiter)
+                f.write(exported_table)
+
+    return out_path
+
+
+def write_exported_tables_to_files(exported, export_format, export_dir):
+    """
+    Write each of the (example, exported table) pairs to a separate file, return the path of the last file.
+    """
+    out_path = None
+
+    for e, exported_table in exported:
+        out_filename = get_table_file_name(e, export_format)
         write_exported_table_to_file(exported_table, export_format, export_dir, out_filename)
+        out_path = os.path.join(export_dir, out_filename)
+
+    return out_path
 
-    return os.path.join(export_dir, out_filename)
+
+def get_exported_table_bytes(exported_table, export_format):
+    if export_format == "xlsx" and isinstance(exported_table, bytes):
+        # workbook exported in a worker process
+        return exported_table
+    elif export_format == "xlsx":
+        return workbook_to_bytes(exported_table)
+    elif export_format == "json":
+        return json.dumps(exported_table).encode()
+    else:
+        return exported_table.encode()
 
 
 def write_exported_table_to_file(exported_table, export_format, export_dir, out_filename):
-    if export_format == "xlsx":
+    if export_format == "xlsx" and not isinstance(exported_table, bytes):
         exported_table.filename = os.path.join(export_dir, out_filename)
         exported_table.close()
-    elif export_format == "json":
-        with open(os.path.join(export_dir, out_filename), "w") as f:
-            json.dump(exported_table, f)
     else:
-        with open(os.path.join(export_dir, out_filename), "w") as f:
-            f.write(exported_table)
+        with open(os.path.join(export_dir, out_filename), "wb") as f:
+            f.write(get_exported_table_bytes(exported_table, export_format))
+
+
+def export_dataset(
+    dataset_name,
+    split,
+    out_dir,
+    export_format,
+    linearization_style,
+    include_props,
+    table_ids,
+    disk_cache_dir=None,
+    single_file=False,
+    compression=None,
+    delimiter="\n\n",
+    workers=1,
+    xlsx_layout="sheets",
+    resume=True,
+    chunk_size=5000,
+):
+    """
+    Export the split (or the tables with `table_ids`) to `out_dir`.
 
+    With `resume`, the tables are exported in chunks of `chunk_size` tables and the completed chunks are recorded
+    in a manifest next to the output, so that an interrupted export continues from the last completed chunk
+    when run again. Resuming is not supported for the Parquet / Arrow export and for the single xlsx workbook.
 
-def export_dataset(dataset_name, split, out_dir, export_format, linearization_style, include_props, table_ids):
+    With `disk_cache_dir`, the prepared tables are stored in the persistent table cache, so that they are reused
+    by the exports with different options.
+    """
     dataset = get_dataset(dataset_name, split)
-    example_ids = table_ids or range(dataset.get_example_count(split))
+    resumable = resume and export_format not in COLUMNAR_FORMATS and not (single_file and export_format == "xlsx")
+
+    if disk_cache_dir is not None:
+        dataset.enable_disk_cache(disk_cache_dir)
+
+    example_ids = list(table_ids or range(dataset.get_example_count(split)))
+
+    if export_format in COLUMNAR_FORMATS:
+        # the whole split is written into a single file
+        os.makedirs(out_dir, exist_ok=True)
+        out_file = os.path.join(out_dir, f"{dataset_name}_{split}.{COLUMNAR_FORMATS[export_format]}")
+        styles = {"styles": [linearization_style]} if linearization_style else {}
+        props = "all" if include_props else "none"
 
+        dataset.export_to_columnar(
+            split, out_file, file_format=export_format, props=props, indices=example_ids, **styles
+        )
+        logger.info("Export finished")
+        return
+
+    export_kwargs = {
+        "export_format": export_format,
+        "export_dir": out_dir,
+        "linearization_style": linearization_style,
+        "include_props": include_props,
+        "edited_cells": {},
+        "single_file": single_file,
+        "compression": compression,
+        "delimiter": delimiter,
+        "workers": workers,
+        "xlsx_layout": xlsx_layout,
+    }
     examples_to_export = [
         {"dataset": dataset_name, "split": split, "table_idx": table_idx} for table_idx in example_ids
     ]
 
-    export_examples_to_file(
-        examples_to_export,
-        export_format=export_format,
-        export_dir=out_dir,
-        linearization_style=linearization_style,
-        # export_filename=export_filename,
-        include_props=include_props,
-        edited_cells={},
-    )
+    if not resumable:
+        export_examples_to_file(examples_to_export, **export_kwargs)
+    else:
+        export_examples_resumable(dataset, examples_to_export, export_kwargs, chunk_size)
 
     logger.info("Export finished")
 
 
+def export_examples_resumable(dataset, examples_to_export, export_kwargs, chunk_size):
+    """
+    Export the examples chunk by chunk, recording the completed chunks in the manifest.
+    """
+    out_dir = export_kwargs["export_dir"]
+    export_format = export_kwargs["export_format"]
+    single_file = export_kwargs["single_file"]
+
+    if not examples_to_export:
+        return
+
+    dataset_name, split = examples_to_export[0]["dataset"], examples_to_export[0]["split"]
+    header = {
+        "dataset": dataset_name,
+        "split": split,
+        "loader_fingerprint": dataset.get_loader_fingerprint(),
+        "data_fingerprint": getattr(dataset.data.get(split), "_fingerprint", None),
+        "export_format": export_format,
+        "options": {key: export_kwargs[key] for key in ["linearization_style", "include_props", "single_file"]},
+        "n_tables": len(examples_to_export),
+        "table_ids_checksum": hashlib.sha256(
+            json.dumps([example["table_idx"] for example in examples_to_export]).encode()
+        ).hexdigest(),
+        "chunk_size": chunk_size,
+    }
+    if single_file:
+        header["options"].update(compression=export_kwargs["compression"], delimiter=export_kwargs["delimiter"])
+        out_filename = get_single_file_name(examples_to_export, export_format, export_kwargs["compression"])
+        out_path = os.path.join(out_dir, out_filename)
+
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, f"{dataset_name}_{split}.{export_format}.manifest.json")
+    manifest = ExportManifest(manifest_path, header)
+
+    def chunk_checksum(chunk):
+        if single_file:
+            if not os.path.exists(out_path) or os.path.getsize(out_path) < chunk["output_end"]:
+                return None
+            return checksum_file_range(out_path, chunk["output_start"], chunk["output_end"])
+
+        paths = [
+            os.path.join(out_dir, get_table_file_name(example, export_format))
+            for example in examples_to_export[chunk["start"] : chunk["end"]]
+        ]
+        if not all(os.path.exists(path) for path in paths):
+            return None
+        return checksum_files(paths)
+
+    manifest.verify(chunk_checksum)
+
+    first_start = len(manifest) * chunk_size
+    if first_start >= len(examples_to_export):
+        return
+
+    if single_file:
+        # drop the output of an interrupted chunk
+        output_start = manifest.chunks[-1]["output_end"] if manifest.chunks else 0
+        if os.path.exists(out_path):
+            os.truncate(out_path, output_start)
+
+    # a single pipeline run (and a single pool of workers) for all the remaining chunks,
+    # the chunks are written and recorded in the manifest as their tables are exported
+    pipeline_args = get_export_pipeline_args(
+        examples_to_export[first_start:],
+        export_format,
+        export_kwargs["linearization_style"],
+        export_kwargs["include_props"],
+        export_kwargs["edited_cells"],
+    )
+    exported = iter_pipeline("export", pipeline_args=pipeline_args, workers=export_kwargs["workers"])
+
+    try:
+        for start in range(first_start, len(examples_to_export), chunk_size):
+            end = min(start + chunk_size, len(examples_to_export))
+            chunk_exported = itertools.islice(exported, end - start)
+
+            if single_file:
+                write_exported_tables_to_single_file(
+                    chunk_exported,
+                    export_format,
+                    out_dir,
+                    out_filename,
+                    compression=export_kwargs["compression"],
+                    delimiter=export_kwargs["delimiter"],
+                    append=output_start > 0,
+                )
+                output_end = os.path.getsize(out_path)
+                checksum = checksum_file_range(out_path, output_start, output_end)
+                manifest.add_chunk(start, end, checksum, output_start=output_start, output_end=output_end)
+                output_start = output_end
+            else:
+                write_exported_tables_to_files(chunk_exported, export_format, out_dir)
+                manifest.add_chunk(start, end, chunk_checksum({"start": start, "end": end}))
+
+            logger.info(f"Completed the chunk {start}-{end} ({end}/{len(examples_to_export)} tables)")
+    finally:
+        # shuts down the pool of workers
+        exported.close()
+
+
 def initialize_dataset(dataset_name):
     dataset = DATASET_CLASSES[dataset_name]()
+    dataset.table_backend = app.config.get("table_backend", "object")
+
+    cache_cfg = app.config.get("table_cache") or {}
+    dataset.configure_table_cache(**{**(cache_cfg.get("default") or {}), **(cache_cfg.get(dataset_name) or {})})
+    dataset.configure_string_pool(**(app.config.get("string_pool") or {}))
+    dataset.configure_linearization_cache(**(app.config.get("linearization_cache") or {}))
+
+    if app.config.get("table_disk_cache_dir"):
+        dataset.enable_disk_cache(os.path.join(app.config["root_dir"], app.config["table_disk_cache_dir"]))
     app.db["datasets_obj"][dataset_name] = dataset
 
     return dataset
@@ -289,6 +633,16 @@ def run_pipeline(pipeline_name, pipeline_args, cache_only=False, force=False):
     return out
 
 
+def iter_pipeline(pipeline_name, pipeline_args, **kwargs):
+    """
+    Run a pipeline supporting streaming (`iter_run()`), yielding the outputs as they are produced.
+    """
+    pipeline = app.db["pipelines_obj"].get(pipeline_name)
+    pipeline_args["pipeline_cfg"] = app.db["pipelines_cfg"][pipeline_name]
+
+    return pipeline.iter_run(pipeline_args, **kwargs)
+
+
 def get_dataset(dataset_name, split):
     dataset = app.db["datasets_obj"].get(dataset_name)
     max_examples = app.config.get("max_examples_per_split", None)
@@ -1,10 +1,15 @@
 #!/usr/bin/env python3
+import collections
+import itertools
 import logging
+from concurrent.futures import ProcessPoolExecutor
 
 import yaml
+from xlsxwriter import Workbook
 
 from ..processing import Pipeline
 from ..processors.export_processor import ExportProcessor
+from ...utils.export import workbook_to_bytes
 
 
 logger = logging.getLogger(__name__)
@@ -14,12 +19,35 @@ class ExportPipeline(Pipeline):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.processors = [ExportProcessor()]
+        self.batch_size = 256
 
-    def run_single(self, pipeline_args, example):
+    @staticmethod
+    def get_dataset_obj(pipeline_args, example):
         if pipeline_args.get("dataset_objs") is not None:
-            dataset_obj = pipeline_args["dataset_objs"][example["dataset"]]
+            return pipeline_args["dataset_objs"][example["dataset"]]
         else:
-            dataset_obj = pipeline_args["dataset_obj"]
+            return pipeline_args["dataset_obj"]
+
+    def prepare_tables(self, pipeline_args, examples):
+        """
+        Prepare the tables for a batch of examples in bulk, grouped by the dataset and split.
+        """
+        groups = {}
+        for example in examples:
+            groups.setdefault((example["dataset"], example["split"]), []).append(example)
+
+        tables = {}
+        for (dataset, split), group in groups.items():
+            dataset_obj = self.get_dataset_obj(pipeline_args, group[0])
+            indices = [example["table_idx"] for example in group]
+
+            for table_idx, table in zip(indices, dataset_obj.prepare_tables(split, indices)):
+                tables[(dataset, split, table_idx)] = table
+
+        return tables
+
+    def run_single(self, pipeline_args, example, table=None):
+        dataset_obj = self.get_dataset_obj(pipeline_args, example)
 
         export_format = pipeline_args["export_format"]
         linearization_style = pipeline_args["linearization_style"]
@@ -34,19 +62,108 @@ class ExportPipeline(Pipeline):
             "table_idx": example["table_idx"],
             "include_props": pipeline_args["include_props"],
             "edited_cells": edited_cells,  # TODO
+            "table": table,
         }
         return self.processors[0].process(content)
 
+    def export_batch(self, pipeline_args, batch):
+        tables = self.prepare_tables(pipeline_args, batch)
+
+        return [
+            self.run_single(
+                pipeline_args=pipeline_args,
+                example=example,
+                table=tables[(example["dataset"], example["split"], example["table_idx"])],
+            )
+            for example in batch
+        ]
+
+    def iter_batches(self, examples):
+        examples = iter(examples)
+
+        while True:
+            batch = list(itertools.islice(examples, self.batch_size))
+
+            if not batch:
+                break
+
+            yield batch
+
+    def iter_tables(self, pipeline_args):
+        """
+        Yield (example, table) pairs with the edited cells applied, for the writers which need the tables
+        themselves instead of the exported tables.
+        """
+        for batch in self.iter_batches(pipeline_args["examples_to_export"]):
+            tables = self.prepare_tables(pipeline_args, batch)
+
+            for example in batch:
+                dataset_obj = self.get_dataset_obj(pipeline_args, example)
+                table = tables[(example["dataset"], example["split"], example["table_idx"])]
+                yield example, dataset_obj.apply_edited_cells(table, pipeline_args.get("edited_cells"))
+
+    def iter_run(self, pipeline_args, workers=1):
+        """
+        Export the examples as they are processed, yielding (example, exported table) pairs in the original order.
+        The tables are prepared in batches, only the batches being processed are held in memory.
+        With `workers` > 1, the batches are processed in parallel by a pool of processes.
+        """
+        batches = self.iter_batches(pipeline_args["examples_to_export"])
+
+        if workers > 1:
+            exported_batches = self._iter_run_parallel(pipeline_args, batches, workers)
+        else:
+            exported_batches = ((batch, self.export_batch(pipeline_args, batch)) for batch in batches)
+
+        n_exported = 0
+
+        for batch, exported in exported_batches:
+            yield from zip(batch, exported)
+            n_exported += len(batch)
+            logger.info(f"Exported {n_exported} example(s)")
+
+    def _iter_run_parallel(self, pipeline_args, batches, workers):
+        # the datasets are sent to each worker only once (the HF datasets are memory-mapped, so that is cheap)
+        worker_args = {key: val for key, val in pipeline_args.items() if key != "examples_to_export"}
+        pending = collections.deque()
+
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_export_worker, initargs=(self, worker_args)
+        ) as executor:
+            for batch in batches:
+                pending.append((batch, executor.submit(_export_batch_in_worker, batch)))
+
+                # bound the number of batches in flight, the results are collected in the submission order
+                if len(pending) >= 2 * workers:
+                    batch, future = pending.popleft()
+                    yield batch, future.result()
+
+            while pending:
+                batch, future = pending.popleft()
+                yield batch, future.result()
+
     def run(self, pipeline_args, cache_only=False, force=True):
         # no caching
-        out = []
+        return [exported for _, exported in self.iter_run(pipeline_args)]
+
+
+_worker_state = {}
+
+
+def _init_export_worker(pipeline, pipeline_args):
+    _worker_state["pipeline"] = pipeline
+    _worker_state["pipeline_args"] = pipeline_args
+
+
+def _export_batch_in_worker(batch):
+    exported = _worker_state["pipeline"].export_batch(_worker_state["pipeline_args"], batch)
 
-        for i, example in enumerate(pipeline_args["examples_to_export"]):
-            if i % 100 == 0:
-                logger.info(f"Exported {i+1} example(s)")
+    return [_to_picklable(exported_table) for exported_table in exported]
 
-            out.append(self.run_single(pipeline_args=pipeline_args, example=example))
 
-        logger.info(f"Exported {i+1} example(s)")
+def _to_picklable(exported_table):
+    # workbooks cannot be sent between processes, the content of the xlsx file is sent instead
+    if isinstance(exported_table, Workbook):
+        return workbook_to_bytes(exported_table)
 
-        return out
+    return exported_table
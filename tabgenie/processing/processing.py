@@ -33,8 +33,12 @@ class Processor:
         return f"<div> {text} </div>"
 
     @staticmethod
-    def html_render(el):
+    def html_render(el, pretty_print=False):
         html = el.render()
+
+        if not pretty_print:
+            return html
+
         return lxml.etree.tostring(lxml.html.fromstring(html), encoding="unicode", pretty_print=True)
 
 
@@ -21,12 +21,16 @@ class CustomInputProcessor(Processor):
             rand_tables[x] = rand_table
 
         prompt = re.sub(r"\[PROMPTVAR:TASK_DEF\]", dataset.get_task_definition(), prompt)
-        prompt = re.sub(r"\[PROMPTVAR:TABLE_CSV\]", dataset.table_to_csv(table), prompt)
-        prompt = re.sub(r"\[PROMPTVAR:HL_CELLS\]", dataset.table_to_linear(table, cell_ids), prompt)
+        prompt = re.sub(r"\[PROMPTVAR:TABLE_CSV\]", dataset.table_to_csv(table, memoize=True), prompt)
+        prompt = re.sub(r"\[PROMPTVAR:HL_CELLS\]", dataset.table_to_linear(table, cell_ids, memoize=True), prompt)
 
         for x in rand_ex:
-            prompt = re.sub(rf"\[PROMPTVAR:RAND{x}_TABLE_CSV\]", dataset.table_to_csv(rand_tables[x]), prompt)
-            prompt = re.sub(rf"\[PROMPTVAR:RAND{x}_HL_CELLS\]", dataset.table_to_linear(rand_tables[x]), prompt)
+            prompt = re.sub(
+                rf"\[PROMPTVAR:RAND{x}_TABLE_CSV\]", dataset.table_to_csv(rand_tables[x], memoize=True), prompt
+            )
+            prompt = re.sub(
+                rf"\[PROMPTVAR:RAND{x}_HL_CELLS\]", dataset.table_to_linear(rand_tables[x], memoize=True), prompt
+            )
             prompt = re.sub(rf"\[PROMPTVAR:RAND{x}_REF\]", dataset.get_reference(rand_tables[x]), prompt)
 
         return prompt
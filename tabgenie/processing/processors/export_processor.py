@@ -13,9 +13,14 @@ class ExportProcessor(Processor):
 
     def process(self, content):
         dataset = content["dataset_obj"]
-        table = dataset.get_table(
-            split=content["split"], table_idx=content["table_idx"], edited_cells=content.get("edited_cells")
-        )
+
+        if content.get("table") is not None:
+            # table prepared in advance by the pipeline
+            table = dataset.apply_edited_cells(content["table"], content.get("edited_cells"))
+        else:
+            table = dataset.get_table(
+                split=content["split"], table_idx=content["table_idx"], edited_cells=content.get("edited_cells")
+            )
 
         exported = dataset.export_table(
             table,
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+import logging
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+    """
+    Dictionary-like cache with LRU eviction
+
+    The cache can be bounded by the number of entries (`max_entries`) and/or by the approximate
+    size of the entries in bytes (`max_bytes`, sizes are computed by `sizeof`).
+    The cache is unbounded if neither of the limits is set.
+    """
+
+    def __init__(self, max_entries=None, max_bytes=None, sizeof=None):
+        if max_bytes is not None and sizeof is None:
+            raise ValueError("The `sizeof` function is required for limiting the cache size in bytes")
+
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.entries = OrderedDict()
+        self.sizes = {}
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __getstate__(self):
+        # the cached entries are not pickled (e.g. when sending the dataset to worker processes)
+        state = self.__dict__.copy()
+        state["entries"] = OrderedDict()
+        state["sizes"] = {}
+        state["total_bytes"] = 0
+        return state
+
+    def get(self, key, default=None):
+        if key not in self.entries:
+            self.misses += 1
+            return default
+
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return self.entries[key]
+
+    def __getitem__(self, key):
+        value = self.get(key, default=KeyError)
+
+        if value is KeyError:
+            raise KeyError(key)
+
+        return value
+
+    def __setitem__(self, key, value):
+        if key in self.entries:
+            self.pop(key)
+
+        size = self.sizeof(value) if self.sizeof is not None else 0
+
+        if self.max_bytes is not None and size > self.max_bytes:
+            logger.warning(f"Cache entry {key} ({size} B) exceeds the cache budget ({self.max_bytes} B), not caching")
+            return
+
+        self.entries[key] = value
+        self.sizes[key] = size
+        self.total_bytes += size
+        self._evict()
+
+    def update_size(self, key):
+        """
+        Measure the entry again after it has changed in place (e.g. a table whose cells have been built).
+        """
+        if key not in self.entries or self.sizeof is None:
+            return
+
+        size = self.sizeof(self.entries[key])
+        self.total_bytes += size - self.sizes[key]
+        self.sizes[key] = size
+        self._evict()
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def pop(self, key, default=None):
+        if key not in self.entries:
+            return default
+
+        self.total_bytes -= self.sizes.pop(key)
+        return self.entries.pop(key)
+
+    def clear(self):
+        self.entries.clear()
+        self.sizes.clear()
+        self.total_bytes = 0
+
+    def _is_full(self):
+        return (self.max_entries is not None and len(self.entries) > self.max_entries) or (
+            self.max_bytes is not None and self.total_bytes > self.max_bytes
+        )
+
+    def _evict(self):
+        while self.entries and self._is_full():
+            key, _ = self.entries.popitem(last=False)
+            self.total_bytes -= self.sizes.pop(key)
+            self.evictions += 1
+
+    def get_stats(self):
+        return {
+            "entries": len(self.entries),
+            "bytes": self.total_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def __repr__(self):
+        return f"LRUCache(max_entries={self.max_entries}, max_bytes={self.max_bytes}, stats={self.get_stats()})"
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+import hashlib
+import logging
+import sys
+
+import numpy as np
+
+from .data import Cell
+
+logger = logging.getLogger(__name__)
+
+
+class CellView:
+    """
+    Lightweight view on a single cell of a `ColumnarTable`
+
+    Provides the same attribute API as `Cell`, reads and writes go directly to the table columns.
+    """
+
+    __slots__ = ("_table", "_cid")
+
+    def __init__(self, table, cid):
+        self._table = table
+        self._cid = cid
+
+    def _get_flag(self, mask):
+        return bool(self._table.flags[self._cid] & mask)
+
+    def _set_flag(self, mask, value):
+        self._table.invalidate_caches()
+
+        if value:
+            self._table.flags[self._cid] |= mask
+        else:
+            self._table.flags[self._cid] &= ~np.uint8(mask)
+
+    @property
+    def idx(self):
+        return self._cid
+
+    @property
+    def value(self):
+        return self._table.values[self._cid]
+
+    @value.setter
+    def value(self, value):
+        self._table.invalidate_caches()
+        self._table.values[self._cid] = value
+
+    @property
+    def colspan(self):
+        return int(self._table.colspans[self._cid])
+
+    @colspan.setter
+    def colspan(self, value):
+        self._table.invalidate_caches()
+        self._table.colspans[self._cid] = value
+
+    @property
+    def rowspan(self):
+        return int(self._table.rowspans[self._cid])
+
+    @rowspan.setter
+    def rowspan(self, value):
+        self._table.invalidate_caches()
+        self._table.rowspans[self._cid] = value
+
+    @property
+    def main_cell(self):
+        return self._table.main_cells.get(self._cid)
+
+    @main_cell.setter
+    def main_cell(self, value):
+        self._table.invalidate_caches()
+
+        if value is None:
+            self._table.main_cells.pop(self._cid, None)
+        else:
+            self._table.main_cells[self._cid] = value
+
+    @property
+    def is_highlighted(self):
+        return self._get_flag(Cell.HIGHLIGHTED)
+
+    @is_highlighted.setter
+    def is_highlighted(self, value):
+        self._set_flag(Cell.HIGHLIGHTED, value)
+
+    @property
+    def is_col_header(self):
+        return self._get_flag(Cell.COL_HEADER)
+
+    @is_col_header.setter
+    def is_col_header(self, value):
+        self._set_flag(Cell.COL_HEADER, value)
+
+    @property
+    def is_row_header(self):
+        return self._get_flag(Cell.ROW_HEADER)
+
+    @is_row_header.setter
+    def is_row_header(self, value):
+        self._set_flag(Cell.ROW_HEADER, value)
+
+    @property
+    def is_dummy(self):
+        return self._get_flag(Cell.DUMMY)
+
+    @is_dummy.setter
+    def is_dummy(self, value):
+        self._set_flag(Cell.DUMMY, value)
+
+    @property
+    def is_header(self):
+        return self._get_flag(Cell.COL_HEADER | Cell.ROW_HEADER)
+
+    def to_dict(self):
+        return {
+            "idx": self.idx,
+            "value": self.value,
+            "colspan": self.colspan,
+            "rowspan": self.rowspan,
+            "is_highlighted": self.is_highlighted,
+            "is_col_header": self.is_col_header,
+            "is_row_header": self.is_row_header,
+            "is_dummy": self.is_dummy,
+            "main_cell": self.main_cell,
+        }
+
+    def serializable_props(self):
+        props = self.to_dict()
+        props["value"] = str(props["value"])
+        return props
+
+    def __repr__(self):
+        return str(self.to_dict())
+
+
+class ColumnarTable:
+    """
+    Table object with columnar storage
+
+    Cell values are kept in a single list, flags and spans in NumPy arrays indexed by the cell id,
+    and the row boundaries in an array of row offsets. Cells are accessed through `CellView` objects,
+    whole-table queries (highlighted cells, header cells) are computed with vectorized masks.
+    """
+
+    def __init__(self):
+        self.props = {}
+        self.outputs = {}
+        self.url = None
+        self.values = []
+        self.flags = np.zeros(0, dtype=np.uint8)
+        self.colspans = np.ones(0, dtype=np.int32)
+        self.rowspans = np.ones(0, dtype=np.int32)
+        self.row_offsets = np.zeros(1, dtype=np.int64)
+        self.main_cells = {}
+        self._fingerprint = None
+
+    @classmethod
+    def from_table(cls, table):
+        t = cls()
+        t.props = table.props
+        t.outputs = table.outputs
+        t.url = table.url
+
+        rows = table.get_cells()
+        cells = [c for row in rows for c in row]
+        n_cells = len(cells)
+
+        t.values = [c.value for c in cells]
+        t.flags = np.fromiter((c._flags for c in cells), dtype=np.uint8, count=n_cells)
+        t.colspans = np.fromiter((c.colspan for c in cells), dtype=np.int32, count=n_cells)
+        t.rowspans = np.fromiter((c.rowspan for c in cells), dtype=np.int32, count=n_cells)
+        t.row_offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum([len(row) for row in rows], out=t.row_offsets[1:])
+        t.main_cells = {cid: c.main_cell for cid, c in enumerate(cells) if c.main_cell is not None}
+
+        if any(c.idx != cid for cid, c in enumerate(cells)):
+            logger.warning("Cell ids do not follow the row-major order, the cells will be renumbered")
+
+        return t
+
+    @property
+    def n_rows(self):
+        return len(self.row_offsets) - 1
+
+    @property
+    def cells(self):
+        return self.get_cells()
+
+    def _row_ids(self, i):
+        return range(self.row_offsets[i], self.row_offsets[i + 1])
+
+    def _views(self, ids):
+        return [CellView(self, int(cid)) for cid in ids]
+
+    def highlighted_mask(self):
+        return (self.flags & Cell.HIGHLIGHTED).astype(bool)
+
+    def header_mask(self):
+        return (self.flags & (Cell.COL_HEADER | Cell.ROW_HEADER)).astype(bool)
+
+    def has_highlights(self):
+        return bool(self.highlighted_mask().any())
+
+    def get_cell(self, i, j):
+        if i < 0:
+            i += self.n_rows
+        if not 0 <= i < self.n_rows:
+            return None
+
+        row_ids = self._row_ids(i)
+        try:
+            return CellView(self, row_ids[j])
+        except IndexError:
+            return None
+
+    def set_cell(self, i, j, c):
+        cid = self._row_ids(i)[j]
+        self.invalidate_caches()
+        view = CellView(self, cid)
+        view.value = c.value
+        view.colspan = c.colspan
+        view.rowspan = c.rowspan
+        view.main_cell = c.main_cell
+        view.is_highlighted = c.is_highlighted
+        view.is_col_header = c.is_col_header
+        view.is_row_header = c.is_row_header
+        view.is_dummy = c.is_dummy
+
+    def get_cell_by_id(self, idx):
+        if not 0 <= idx < len(self.values):
+            raise KeyError(idx)
+
+        return CellView(self, idx)
+
+    def get_flat_cells(self, highlighted_only=False):
+        if highlighted_only:
+            return self._views(np.flatnonzero(self.highlighted_mask()))
+
+        return self._views(range(len(self.values)))
+
+    def get_highlighted_cells(self):
+        return self.get_cells(highlighted_only=True)
+
+    def get_header_cells(self):
+        return self._views(np.flatnonzero(self.header_mask()))
+
+    def get_cells(self, highlighted_only=False):
+        if not highlighted_only:
+            return [self._views(self._row_ids(i)) for i in range(self.n_rows)]
+
+        ids = np.flatnonzero(self.highlighted_mask())
+        # split the highlighted ids by the rows they belong to, dropping empty rows
+        row_of_id = np.searchsorted(self.row_offsets, ids, side="right") - 1
+        boundaries = np.flatnonzero(np.diff(row_of_id)) + 1
+
+        return [self._views(row_ids) for row_ids in np.split(ids, boundaries) if len(row_ids)]
+
+    def get_row_headers(self, row_idx, column_idx):
+        try:
+            ids = np.arange(self.row_offsets[row_idx], self.row_offsets[row_idx + 1])[:column_idx]
+            return self._views(ids[(self.flags[ids] & Cell.ROW_HEADER).astype(bool)])
+
+        except Exception as e:
+            logger.exception(e)
+
+    def get_col_headers(self, row_idx, column_idx):
+        try:
+            starts = self.row_offsets[:-1][:row_idx]
+            lengths = np.diff(self.row_offsets)[:row_idx]
+            ids = (starts + column_idx)[lengths > column_idx]
+            return self._views(ids[(self.flags[ids] & Cell.COL_HEADER).astype(bool)])
+
+        except Exception as e:
+            logger.exception(e)
+
+    def invalidate_caches(self):
+        """
+        Drop the fingerprint computed from the cells. Called automatically by the cell views,
+        the columns modified directly require calling it explicitly.
+        """
+        self._fingerprint = None
+
+    def get_fingerprint(self):
+        """
+        Hash of the cell contents, computed once until the cells change.
+        """
+        if self._fingerprint is None:
+            h = hashlib.blake2b(repr(self.values).encode(), digest_size=16)
+
+            for arr in [self.flags, self.colspans, self.rowspans, self.row_offsets]:
+                h.update(arr.tobytes())
+
+            h.update(repr(sorted(self.main_cells.items())).encode())
+            self._fingerprint = h.hexdigest()
+
+        return self._fingerprint
+
+    def get_generated_output(self, key):
+        return self.outputs.get(key)
+
+    def set_generated_output(self, key, value):
+        self.outputs[key] = value
+
+    def estimate_size(self):
+        """
+        Approximate memory footprint of the table in bytes.
+        """
+        size = sys.getsizeof(self) + sys.getsizeof(self.props)
+        size += sum(sys.getsizeof(key) + sys.getsizeof(val) for key, val in self.props.items())
+        size += sys.getsizeof(self.values) + sum(sys.getsizeof(v) for v in self.values)
+        size += self.flags.nbytes + self.colspans.nbytes + self.rowspans.nbytes + self.row_offsets.nbytes
+        size += sys.getsizeof(self.main_cells)
+
+        return size
+
+    def __repr__(self):
+        return str(self.__dict__)
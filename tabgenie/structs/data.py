@@ -1,9 +1,19 @@
 #!/usr/bin/env python3
-import copy
+import bisect
+import functools
+import hashlib
+import inspect
+import json
 import logging
+import os
+import sys
 
 import datasets
-from ..utils import export
+from ..utils import columnar_export, export
+from ..utils.packing import pack_examples
+from .cache import LRUCache
+from .disk_cache import DiskTableCache
+from .string_pool import StringPool
 
 logger = logging.getLogger(__name__)
 
@@ -11,8 +21,19 @@ logger = logging.getLogger(__name__)
 class Cell:
     """
     Table cell
+
+    Uses `__slots__` and packs the boolean flags into a single bitfield
+    to keep the memory footprint of large tables low.
     """
 
+    __slots__ = ("idx", "value", "colspan", "rowspan", "main_cell", "_flags")
+
+    # bit masks for the `_flags` bitfield
+    HIGHLIGHTED = 1
+    COL_HEADER = 2
+    ROW_HEADER = 4
+    DUMMY = 8
+
     def __init__(
         self,
         value=None,
@@ -29,23 +50,79 @@ class Cell:
         self.value = value
         self.colspan = colspan
         self.rowspan = rowspan
-        self.is_highlighted = is_highlighted
-        self.is_col_header = is_col_header
-        self.is_row_header = is_row_header
-        self.is_dummy = is_dummy
+        self._flags = (
+            (self.HIGHLIGHTED if is_highlighted else 0)
+            | (self.COL_HEADER if is_col_header else 0)
+            | (self.ROW_HEADER if is_row_header else 0)
+            | (self.DUMMY if is_dummy else 0)
+        )
         self.main_cell = main_cell  # for dummy cells
 
+    def _get_flag(self, mask):
+        return bool(self._flags & mask)
+
+    def _set_flag(self, mask, value):
+        if value:
+            self._flags |= mask
+        else:
+            self._flags &= ~mask
+
+    @property
+    def is_highlighted(self):
+        return self._get_flag(self.HIGHLIGHTED)
+
+    @is_highlighted.setter
+    def is_highlighted(self, value):
+        self._set_flag(self.HIGHLIGHTED, value)
+
+    @property
+    def is_col_header(self):
+        return self._get_flag(self.COL_HEADER)
+
+    @is_col_header.setter
+    def is_col_header(self, value):
+        self._set_flag(self.COL_HEADER, value)
+
+    @property
+    def is_row_header(self):
+        return self._get_flag(self.ROW_HEADER)
+
+    @is_row_header.setter
+    def is_row_header(self, value):
+        self._set_flag(self.ROW_HEADER, value)
+
+    @property
+    def is_dummy(self):
+        return self._get_flag(self.DUMMY)
+
+    @is_dummy.setter
+    def is_dummy(self, value):
+        self._set_flag(self.DUMMY, value)
+
     @property
     def is_header(self):
-        return self.is_col_header or self.is_row_header
+        return bool(self._flags & (self.COL_HEADER | self.ROW_HEADER))
+
+    def to_dict(self):
+        return {
+            "idx": self.idx,
+            "value": self.value,
+            "colspan": self.colspan,
+            "rowspan": self.rowspan,
+            "is_highlighted": self.is_highlighted,
+            "is_col_header": self.is_col_header,
+            "is_row_header": self.is_row_header,
+            "is_dummy": self.is_dummy,
+            "main_cell": self.main_cell,
+        }
 
     def serializable_props(self):
-        props = copy.deepcopy(vars(self))
+        props = self.to_dict()
         props["value"] = str(props["value"])
         return props
 
     def __repr__(self):
-        return str(vars(self))
+        return str(self.to_dict())
 
 
 class Table:
@@ -53,14 +130,93 @@ class Table:
     Table object
     """
 
+    # bump after changing the format of `to_record()`
+    RECORD_VERSION = 1
+
     def __init__(self):
         self.props = {}
-        self.cells = []
         self.outputs = {}
         self.url = None
         self.cell_idx = 0
         self.current_row = []
-        self.cell_by_ids = {}
+        self._cells = []
+        self._cell_by_ids = {}
+        self._cell_builder = None
+        self._deferred_size = 0
+        self._materialize_hooks = []
+        self._header_index = None
+        self._fingerprint = None
+        self.string_pool = None
+
+    def set_string_pool(self, pool):
+        """
+        Share the cell values (and property keys) with the other tables using the same `StringPool`.
+        The cells added later are interned in `add_cell()`.
+        """
+        self.string_pool = pool
+        self.props = {pool.intern(key): val for key, val in self.props.items()}
+
+        for row in self._cells:
+            for cell in row:
+                cell.value = pool.intern(cell.value)
+
+        for cell in self.current_row:
+            cell.value = pool.intern(cell.value)
+
+    def defer_cells(self, builder, size=0):
+        """
+        Register a function `builder(table)` adding the cells to the table. The function is called
+        on the first access to the cells, so that the tables which are used only for their properties
+        are never fully built. `size` is the approximate size of the data kept by the builder (e.g. the raw
+        dataset entry), counted by `estimate_size()` until the cells are built. It can be also a function
+        computing the size, called on the first call of `estimate_size()`.
+        """
+        self._cell_builder = builder
+        self._deferred_size = size
+
+    def add_materialize_hook(self, hook):
+        """
+        Register a function `hook(table)` called once after the deferred cells are built, e.g. for measuring
+        the table again in a size-bounded cache. The hook is called immediately if the cells are already built.
+        """
+        if self.is_materialized:
+            hook(self)
+        else:
+            self._materialize_hooks.append(hook)
+
+    def _materialize(self):
+        if self._cell_builder is not None:
+            builder = self._cell_builder
+            self._cell_builder = None
+            self._deferred_size = 0
+            builder(self)
+
+            hooks = self._materialize_hooks
+            self._materialize_hooks = []
+
+            for hook in hooks:
+                hook(self)
+
+    @property
+    def is_materialized(self):
+        return self._cell_builder is None
+
+    @property
+    def cells(self):
+        self._materialize()
+        return self._cells
+
+    @cells.setter
+    def cells(self, cells):
+        self._cell_builder = None
+        self._deferred_size = 0
+        self._cells = cells
+        self.invalidate_caches()
+
+    @property
+    def cell_by_ids(self):
+        self._materialize()
+        return self._cell_by_ids
 
     def has_highlights(self):
         return any(cell.is_highlighted for row in self.cells for cell in row)
@@ -69,15 +225,72 @@ class Table:
         if self.current_row:
             self.cells.append(self.current_row)
             self.current_row = []
+            self.invalidate_caches()
 
     def add_cell(self, cell):
+        if self.string_pool is not None:
+            cell.value = self.string_pool.intern(cell.value)
+
         cell.idx = self.cell_idx
         self.current_row.append(cell)
         self.cell_by_ids[self.cell_idx] = cell
         self.cell_idx += 1
+        self.invalidate_caches()
 
     def set_cell(self, i, j, c):
         self.cells[i][j] = c
+        self.invalidate_caches()
+
+    def invalidate_caches(self):
+        """
+        Drop the header index and the fingerprint computed from the cells. Called automatically when cells
+        are added or replaced, cells modified in place require calling it explicitly.
+        """
+        self._header_index = None
+        self._fingerprint = None
+
+    def get_fingerprint(self):
+        """
+        Hash of the cell contents (values, spans, flags), computed once until the cells change.
+        """
+        if self._fingerprint is None:
+            h = hashlib.blake2b(digest_size=16)
+
+            for row in self.get_cells():
+                h.update(repr([(c.value, c.colspan, c.rowspan, c._flags, c.main_cell) for c in row]).encode())
+
+            self._fingerprint = h.hexdigest()
+
+        return self._fingerprint
+
+    def _get_header_index(self):
+        """
+        Index of the header cells built once per table:
+        - for each row, the column indices and the row header cells in the row,
+        - for each column, the row indices and the column header cells in the column.
+        """
+        if self._header_index is None:
+            row_index = []
+            col_index = {}
+
+            for i, row in enumerate(self.get_cells()):
+                row_cols, row_cells = [], []
+
+                for j, c in enumerate(row):
+                    if c.is_row_header:
+                        row_cols.append(j)
+                        row_cells.append(c)
+
+                    if c.is_col_header:
+                        col_rows, col_cells = col_index.setdefault(j, ([], []))
+                        col_rows.append(i)
+                        col_cells.append(c)
+
+                row_index.append((row_cols, row_cells))
+
+            self._header_index = (row_index, col_index)
+
+        return self._header_index
 
     def get_cell(self, i, j):
         try:
@@ -94,6 +307,9 @@ class Table:
     def get_highlighted_cells(self):
         return self.get_cells(highlighted_only=True)
 
+    def get_header_cells(self):
+        return [x for row in self.cells for x in row if x.is_header]
+
     def get_cells(self, highlighted_only=False):
         if highlighted_only:
             cells = []
@@ -107,23 +323,18 @@ class Table:
 
     def get_row_headers(self, row_idx, column_idx):
         try:
-            headers = [c for c in self.get_cells()[row_idx][:column_idx] if c.is_row_header]
-            return headers
+            row_index, _ = self._get_header_index()
+            cols, cells = row_index[row_idx]
+            return cells[: bisect.bisect_left(cols, column_idx)]
 
         except Exception as e:
             logger.exception(e)
 
     def get_col_headers(self, row_idx, column_idx):
         try:
-            headers = []
-            for i, row in enumerate(self.get_cells()):
-                if i == row_idx:
-                    return headers
-
-                if len(row) > column_idx and row[column_idx].is_col_header:
-                    headers.append(row[column_idx])
-
-            return headers
+            _, col_index = self._get_header_index()
+            rows, cells = col_index.get(column_idx, ([], []))
+            return cells[: bisect.bisect_left(rows, row_idx)]
 
         except Exception as e:
             logger.exception(e)
@@ -134,22 +345,188 @@ class Table:
     def set_generated_output(self, key, value):
         self.outputs[key] = value
 
+    def to_record(self):
+        """
+        Compact representation of the table built from plain Python objects, used for persistent caching.
+        """
+        rows = [[(c.value, c.colspan, c.rowspan, c._flags, c.main_cell) for c in row] for row in self.get_cells()]
+        return (self.props, self.outputs, self.url, rows)
+
+    @classmethod
+    def from_record(cls, record):
+        props, outputs, url, rows = record
+        t = cls()
+        t.props = props
+        t.outputs = outputs
+        t.url = url
+
+        for row in rows:
+            for value, colspan, rowspan, flags, main_cell in row:
+                c = Cell(value, colspan=colspan, rowspan=rowspan, main_cell=main_cell)
+                c._flags = flags
+                t.add_cell(c)
+            t.save_row()
+
+        return t
+
+    def estimate_size(self):
+        """
+        Approximate memory footprint of the table in bytes. The deferred cells are not built,
+        the data kept for building them is counted instead.
+        """
+        if callable(self._deferred_size):
+            self._deferred_size = self._deferred_size()
+
+        size = sys.getsizeof(self) + _estimate_dict_size(self.props) + sys.getsizeof(self._cell_by_ids)
+        size += self._deferred_size
+
+        for row in self._cells:
+            size += sys.getsizeof(row)
+
+            for c in row:
+                size += sys.getsizeof(c) + sys.getsizeof(c.value)
+
+        return size
+
     def __repr__(self):
         return str(self.__dict__)
 
 
+def _estimate_table_size(table):
+    # a module-level function, so that the table caches can be pickled (e.g. for the spawned worker processes)
+    return table.estimate_size()
+
+
+def _estimate_dict_size(d):
+    return sys.getsizeof(d) + sum(sys.getsizeof(key) + sys.getsizeof(val) for key, val in d.items())
+
+
+def _estimate_object_size(obj):
+    # recursive size of the nested containers of a raw dataset entry
+    size = sys.getsizeof(obj)
+
+    if isinstance(obj, dict):
+        size += sum(_estimate_object_size(key) + _estimate_object_size(val) for key, val in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(_estimate_object_size(item) for item in obj)
+
+    return size
+
+
+class EditedTable:
+    """
+    Copy-on-write overlay of a table with edited cell values
+
+    Wraps the original table and a `{cell_id: value}` patch. Reads resolve through the patch
+    and only the edited cells are copied, the wrapped table is never modified.
+    """
+
+    def __init__(self, table, edited_cells):
+        self.table = table
+        self.edited_cells = {}
+        self._rows = None
+        self._fingerprint = None
+
+        for cell_id, val in edited_cells.items():
+            cell = Cell(**table.get_cell_by_id(int(cell_id)).to_dict())
+            cell.value = val
+            self.edited_cells[cell.idx] = cell
+
+    def __getattr__(self, name):
+        # props, outputs, url, has_highlights() etc. are shared with the original table
+        return getattr(self.table, name)
+
+    def _resolve(self, cell):
+        if cell is None:
+            return None
+
+        return self.edited_cells.get(cell.idx, cell)
+
+    def _resolve_list(self, cells):
+        if cells is None:
+            return None
+
+        return [self._resolve(c) for c in cells]
+
+    @property
+    def cells(self):
+        return self.get_cells()
+
+    def get_cell(self, i, j):
+        return self._resolve(self.table.get_cell(i, j))
+
+    def get_cell_by_id(self, idx):
+        return self._resolve(self.table.get_cell_by_id(idx))
+
+    def get_flat_cells(self, highlighted_only=False):
+        return self._resolve_list(self.table.get_flat_cells(highlighted_only=highlighted_only))
+
+    def get_highlighted_cells(self):
+        return self.get_cells(highlighted_only=True)
+
+    def get_header_cells(self):
+        return self._resolve_list(self.table.get_header_cells())
+
+    def get_cells(self, highlighted_only=False):
+        if highlighted_only:
+            return [self._resolve_list(row) for row in self.table.get_cells(highlighted_only=True)]
+
+        if self._rows is None:
+            # rows without edited cells are shared with the original table
+            self._rows = [
+                self._resolve_list(row) if any(c.idx in self.edited_cells for c in row) else row
+                for row in self.table.get_cells()
+            ]
+
+        return self._rows
+
+    def get_fingerprint(self):
+        if self._fingerprint is None:
+            edits = sorted((idx, cell.value) for idx, cell in self.edited_cells.items())
+            h = hashlib.blake2b(self.table.get_fingerprint().encode(), digest_size=16)
+            h.update(repr(edits).encode())
+            self._fingerprint = h.hexdigest()
+
+        return self._fingerprint
+
+    def get_row_headers(self, row_idx, column_idx):
+        return self._resolve_list(self.table.get_row_headers(row_idx, column_idx))
+
+    def get_col_headers(self, row_idx, column_idx):
+        return self._resolve_list(self.table.get_col_headers(row_idx, column_idx))
+
+    def __repr__(self):
+        return f"EditedTable({self.table!r}, {self.edited_cells!r})"
+
+
 class TabularDataset:
     """
     Base class for the datasets
     """
 
+    # bump the version after changing the way the tables are prepared
+    # to invalidate the persistent table cache
+    loader_version = 1
+    # bump the version after changing the output of `get_hf_dataset()` to invalidate the cached tokenized splits
+    hf_dataset_version = 1
+
     def __init__(self, path):
         self.splits = ["train", "dev", "test"]
         self.data = {split: [] for split in self.splits}
-        self.tables = {split: {} for split in self.splits}
+        self.tables = {split: LRUCache() for split in self.splits}
         self.path = path
         self.dataset_info = {}
         self.name = None
+        self.table_backend = "object"  # 'object' or 'columnar'
+        self.disk_cache_dir = None
+        self.disk_caches = {}
+        # raw column with the reference, or the columns needed by `get_entry_reference()`
+        self.reference_column = None
+        self.reference_columns = None
+        # shared by all the tables of the dataset, set to None to disable interning of cell values
+        self.string_pool = StringPool()
+        # outputs of `table_to_linear()` and `table_to_csv()` called with `memoize=True`, set to None to disable
+        self.linearization_cache = LRUCache(max_bytes=32 * 1024 * 1024, sizeof=sys.getsizeof)
 
     def load(self, split, max_examples=None):
         """
@@ -158,10 +535,162 @@ class TabularDataset:
         """
         raise NotImplementedError
 
+    def configure_table_cache(self, max_entries=None, max_bytes=None):
+        """
+        Bound the cache of prepared tables for each split. The cached tables are evicted in the LRU order
+        when the cache exceeds `max_entries` tables or approximately `max_bytes` bytes.
+        """
+        self.tables = {
+            split: LRUCache(max_entries=max_entries, max_bytes=max_bytes, sizeof=_estimate_table_size)
+            for split in self.splits
+        }
+
+    def get_cache_stats(self):
+        return {split: cache.get_stats() for split, cache in self.tables.items()}
+
+    def configure_string_pool(self, enabled=True, max_length=64, max_entries=200000):
+        self.string_pool = StringPool(max_length=max_length, max_entries=max_entries) if enabled else None
+
+    def get_string_pool_stats(self):
+        """
+        Statistics of the shared string pool, `dedup_ratio` is the number of interned values per unique string.
+        """
+        if self.string_pool is None:
+            return None
+
+        return self.string_pool.get_stats()
+
+    def _share_strings(self, table):
+        if self.string_pool is not None:
+            table.set_string_pool(self.string_pool)
+
+        return table
+
+    def configure_linearization_cache(self, enabled=True, max_entries=None, max_bytes=32 * 1024 * 1024):
+        """
+        Bound the cache of linearized tables. The entries are keyed by the table fingerprint and the options,
+        so that a table is not linearized again when it is rendered repeatedly (e.g. in prompts). Only the calls
+        with `memoize=True` use the cache.
+        """
+        self.linearization_cache = (
+            LRUCache(max_entries=max_entries, max_bytes=max_bytes, sizeof=sys.getsizeof) if enabled else None
+        )
+
+    def get_linearization_cache_stats(self):
+        if self.linearization_cache is None:
+            return None
+
+        return self.linearization_cache.get_stats()
+
+    def _memoize(self, key, fn):
+        if self.linearization_cache is None:
+            return fn()
+
+        value = self.linearization_cache.get(key)
+
+        if value is None:
+            value = fn()
+            self.linearization_cache[key] = value
+
+        return value
+
+    def enable_disk_cache(self, cache_dir):
+        """
+        Store the prepared tables persistently in `cache_dir`, so that they do not have to be prepared
+        again after the process restarts.
+        """
+        self.disk_cache_dir = cache_dir
+        self.disk_caches = {}
+
+    def get_loader_fingerprint(self):
+        """
+        Fingerprint of the code preparing the tables: changes whenever the loader module
+        or the `loader_version` changes.
+        """
+        h = hashlib.sha1()
+        h.update(f"{type(self).__module__}.{type(self).__qualname__}".encode())
+        h.update(f"{self.loader_version}:{Table.RECORD_VERSION}".encode())
+
+        try:
+            h.update(inspect.getsource(sys.modules[type(self).__module__]).encode())
+        except (OSError, TypeError):
+            logger.warning(f"Cannot read the source of {type(self).__name__}, using only `loader_version`")
+
+        return h.hexdigest()[:16]
+
+    def _get_disk_cache(self, split):
+        if self.disk_cache_dir is None:
+            return None
+
+        if split not in self.disk_caches:
+            # the fingerprint of the loaded data (if available) invalidates the cache after the dataset is updated
+            data_fingerprint = getattr(self.data[split], "_fingerprint", None) or "local"
+            fingerprint = hashlib.sha1(f"{self.get_loader_fingerprint()}:{data_fingerprint}".encode()).hexdigest()[:16]
+            path = os.path.join(self.disk_cache_dir, type(self).__name__.lower(), f"{split}-{fingerprint}")
+            self.disk_caches[split] = DiskTableCache(path, table_cls=Table)
+
+        return self.disk_caches[split]
+
+    def prepare_cached_table(self, split, table_idx, entry=None):
+        """
+        Prepare the table, using the persistent table cache if it is enabled.
+        """
+        disk_cache = self._get_disk_cache(split)
+
+        if disk_cache is not None:
+            table = disk_cache.get(table_idx)
+
+            if table is not None:
+                return self._share_strings(table)
+
+        if entry is None:
+            entry = self.data[split][table_idx]
+
+        table = self._share_strings(self.prepare_table(entry))
+
+        if disk_cache is not None:
+            self._put_to_disk_cache(disk_cache, table_idx, table)
+
+        return table
+
+    @staticmethod
+    def _put_to_disk_cache(disk_cache, table_idx, table):
+        # the record contains the cells, so the table is stored only after its deferred cells are built
+        # (the tables used only for their properties are not stored)
+        table.add_materialize_hook(lambda t: disk_cache.put(table_idx, t))
+
     @staticmethod
     def get_reference(table):
         return table.props.get("reference")
 
+    def get_entry_reference(self, entry):
+        """
+        Reference derived directly from the raw dataset entry. Loaders with a reference
+        which is not a plain column override this method and set `self.reference_columns`.
+        """
+        return entry[self.reference_column]
+
+    def get_references(self, split):
+        """
+        Return the references for all the examples in the split, reading only the reference column(s)
+        instead of preparing the tables.
+        """
+        columns = self.reference_columns or [self.reference_column]
+        data = self.data[split]
+
+        if None in columns:
+            # reference source not declared by the loader
+            return [self.get_reference(table) for _, table in self.iter_tables(split)]
+
+        if not isinstance(data, datasets.Dataset):
+            return [self.get_entry_reference(entry) for entry in data]
+
+        if self.reference_columns is None:
+            return list(data[self.reference_column])
+
+        column_values = [data[col] for col in columns]
+        return [self.get_entry_reference(dict(zip(columns, values))) for values in zip(*column_values)]
+
     def get_example_count(self, split):
         return len(self.data[split])
 
@@ -169,27 +698,132 @@ class TabularDataset:
         return bool(self.data[split])
 
     def get_table(self, split, table_idx, edited_cells=None):
-        table = self.tables[split].get(table_idx)
+        cache = self.tables[split]
+        table = cache.get(table_idx)
 
         if not table:
-            entry = self.data[split][table_idx]
-            table = self.prepare_table(entry)
-            self.tables[split][table_idx] = table
+            table = self.convert_table(self.prepare_cached_table(split, table_idx))
+            cache[table_idx] = table
 
-        if edited_cells:
-            # make a temporary copy of the table with edited cells
-            table_modif = copy.deepcopy(table)
+            if isinstance(table, Table):
+                # the size of a table with deferred cells changes after the cells are built
+                table.add_materialize_hook(lambda _: cache.update_size(table_idx))
 
-            for cell_id, val in edited_cells.items():
-                cell = table_modif.get_cell_by_id(int(cell_id))
-                cell.value = val
+        return self.apply_edited_cells(table, edited_cells)
 
-            table = table_modif
+    @staticmethod
+    def apply_edited_cells(table, edited_cells):
+        if edited_cells:
+            # overlay the edited cells over the table, the original table stays unchanged
+            table = EditedTable(table, edited_cells)
 
         return table
 
     def prepare_table(self, entry):
-        return NotImplementedError
+        """
+        Prepare the table from the dataset entry.
+
+        The default implementation is used by the loaders which define `prepare_props()`
+        and `prepare_cells()`: the properties are prepared immediately and the cells are built
+        only when they are first accessed.
+        """
+        t = Table()
+        self.prepare_props(t, entry)
+        t.defer_cells(
+            lambda table: self.prepare_cells(table, entry), size=functools.partial(_estimate_object_size, entry)
+        )
+
+        return t
+
+    def prepare_props(self, t, entry):
+        raise NotImplementedError
+
+    def prepare_cells(self, t, entry):
+        raise NotImplementedError
+
+    def prepare_table_batch(self, batch):
+        """
+        Prepare tables from a batch of entries in the columnar format (dict of columns).
+        Can be overriden by the loaders which can build the tables more efficiently in bulk.
+        """
+        keys = list(batch.keys())
+        entries = [dict(zip(keys, values)) for values in zip(*batch.values())]
+
+        return [self.prepare_table(entry) for entry in entries]
+
+    def _get_entry_batch(self, split, indices):
+        data = self.data[split]
+
+        if not isinstance(data, datasets.Dataset):
+            # local datasets: list of entries
+            entries = [data[i] for i in indices]
+            return {key: [entry[key] for entry in entries] for key in (entries[0].keys() if entries else [])}
+
+        if indices == list(range(indices[0], indices[-1] + 1)):
+            # contiguous slice
+            return data[indices[0] : indices[-1] + 1]
+
+        return data[indices]
+
+    def prepare_tables(self, split, indices):
+        """
+        Prepare the tables with the given indices. The entries which are not cached are decoded
+        from the dataset in a single columnar access and the tables are built in bulk.
+        The prepared tables are not added to the in-memory table cache.
+        """
+        indices = list(indices)
+        disk_cache = self._get_disk_cache(split)
+        tables = {}
+
+        for idx in indices:
+            if idx in self.tables[split]:
+                tables[idx] = self.tables[split].get(idx)
+            elif disk_cache is not None and idx in disk_cache:
+                tables[idx] = self.convert_table(self._share_strings(disk_cache.get(idx)))
+
+        missing = sorted(set(idx for idx in indices if idx not in tables))
+
+        if missing:
+            batch = self._get_entry_batch(split, missing)
+
+            for idx, table in zip(missing, self.prepare_table_batch(batch)):
+                table = self._share_strings(table)
+
+                if disk_cache is not None:
+                    self._put_to_disk_cache(disk_cache, idx, table)
+
+                tables[idx] = self.convert_table(table)
+
+        return [tables[idx] for idx in indices]
+
+    def iter_tables(self, split, indices=None, batch_size=256):
+        """
+        Iterate over (index, table) pairs, preparing the tables in batches.
+        """
+        if indices is None:
+            indices = range(self.get_example_count(split))
+
+        if not isinstance(indices, range):
+            indices = list(indices)
+
+        for start in range(0, len(indices), batch_size):
+            batch_indices = indices[start : start + batch_size]
+            yield from zip(batch_indices, self.prepare_tables(split, batch_indices))
+
+    def convert_table(self, table):
+        """
+        Convert a prepared table to the storage backend selected by `self.table_backend`.
+        """
+        if self.table_backend == "columnar":
+            from .columnar import ColumnarTable
+
+            return ColumnarTable.from_table(table)
+        elif self.table_backend == "object":
+            return table
+        else:
+            raise NotImplementedError(
+                f"{self.table_backend} table backend is not recognized. " f'Available options: "object", "columnar".'
+            )
 
     def get_info(self):
         return self.dataset_info
@@ -232,15 +866,51 @@ class TabularDataset:
     def export(self, split, table_cfg):
         exported = []
 
-        for i in range(self.get_example_count(split)):
+        for _, table in self.iter_tables(split):
             obj = {}
             for key, export_format in table_cfg["fields"].items():
-                table = self.get_table(split, i)
                 obj[key] = self.export_table(table, export_format=export_format)
             exported.append(obj)
 
         return exported
 
+    def export_to_columnar(
+        self,
+        split,
+        out_file,
+        file_format="parquet",
+        styles=("2d", "markers", "index"),
+        props="all",
+        highlighted_only=False,
+        indices=None,
+        batch_size=1000,
+    ):
+        """
+        Export the split to a Parquet or Arrow IPC file with a row per table (see `columnar_export.get_schema()`),
+        which can be memory-mapped by the training jobs instead of loading the dataset with TabGenie.
+        """
+
+        def iter_rows():
+            for idx, table in self.iter_tables(split, indices, batch_size=batch_size):
+                row = {"table_idx": idx}
+                linearized = self.table_to_linear_styles(
+                    table, styles=styles, props=props, highlighted_only=highlighted_only
+                )
+
+                for style in styles:
+                    row[f"linearized_{style}"] = linearized[style]
+
+                ref = self.get_reference(table)
+                row["reference"] = ref if ref is None or isinstance(ref, str) else json.dumps(ref, default=str)
+                row["props"] = json.dumps(table.props, default=str)
+                row["cells"] = self.table_to_json(table, include_props=False)["data"]
+
+                yield row
+
+        schema = columnar_export.get_schema(styles)
+        n_rows = columnar_export.write_columnar_file(iter_rows(), out_file, schema, file_format, batch_size)
+        logger.info(f"Exported {n_rows} table(s) to {out_file}")
+
     def get_hf_dataset(
         self,
         split,
@@ -250,53 +920,203 @@ class TabularDataset:
         highlighted_only=True,
         max_length=512,
         num_proc=8,
+        batch_size=256,
+        load_from_cache_file=True,
+        mode="eager",  # 'eager' or 'lazy'
+        with_lengths=False,
+        packing=False,
     ):
-        # linearize tables and convert to input_ids
-        if linearize_params is None:
-            linearize_params = {}
+        """
+        Linearize and tokenize the split for training a model with HF transformers.
+
+        In the eager mode, the split is processed in batches using `num_proc` processes. The output is cached
+        by HF datasets under a fingerprint derived from the dataset, the split, the loader, the linearization
+        and the tokenizer (see `get_hf_dataset_fingerprint()`), so that it is reused in the subsequent runs.
+
+        In the lazy mode, the raw split is returned with a transform which prepares, linearizes and tokenizes
+        the examples only when they are accessed, without the upfront pass over the split. The columns are
+        returned as lists. The transform needs the raw columns, so `remove_unused_columns=False` has to be set
+        in the training arguments of the HF `Trainer`.
+
+        With `with_lengths=True`, the numbers of input and label tokens are added as the `input_length`
+        and `label_length` columns, e.g. for grouping the examples by length (see `tabgenie.utils.sampling`
+        or `group_by_length` and `length_column_name` in the HF training arguments).
+
+        With `packing=True` (eager mode only), the examples of each batch of `batch_size` examples are packed
+        into sequences of up to `max_length` tokens (see `tabgenie.utils.packing`). The rows contain `segment_ids`,
+        `label_segment_ids` and `example_ids` instead of `attention_mask`, the masks are built by
+        `PackedSeq2SeqCollator` and passed to the model by `packed_seq2seq_forward()`.
+        """
+        if mode not in ["eager", "lazy"]:
+            raise ValueError(f'Unknown mode "{mode}", available options: "eager", "lazy"')
+
+        if packing and mode == "lazy":
+            raise ValueError("Packing is not supported in the lazy mode")
+
+        linearize_params = dict(linearize_params or {})
 
         if linearize_fn is None:
             linearize_fn = self.table_to_linear
             linearize_params["style"] = "markers"
             linearize_params["highlighted_only"] = highlighted_only
 
-        def process_example(example):
-            table_obj = self.prepare_table(example)
-            linearized = linearize_fn(table_obj, **linearize_params)
-            ref = self.get_reference(table_obj)
+        def process_batch(examples, indices=None):
+            entries = [dict(zip(examples.keys(), values)) for values in zip(*examples.values())]
+
+            if indices is None:
+                # the transform does not receive the indices, so the persistent table cache cannot be used
+                tables = [self.prepare_table(entry) for entry in entries]
+            else:
+                tables = [self.prepare_cached_table(split, idx, entry=entry) for idx, entry in zip(indices, entries)]
+
+            linearized = [linearize_fn(table, **linearize_params) for table in tables]
+            refs = [self.get_reference(table) for table in tables]
 
             tokens = tokenizer(linearized, max_length=max_length, truncation=True)
-            ref_tokens = tokenizer(text_target=ref, max_length=max_length, truncation=True)
-            tokens["labels"] = ref_tokens["input_ids"]
+            ref_tokens = tokenizer(text_target=refs, max_length=max_length, truncation=True)
+
+            processed = {key: tokens[key] for key in ["input_ids", "attention_mask"] if key in tokens}
+            processed["labels"] = ref_tokens["input_ids"]
+
+            if packing:
+                processed = pack_examples(
+                    processed["input_ids"], processed["labels"], example_ids=indices, max_length=max_length
+                )
 
-            return tokens
+            if with_lengths:
+                processed["input_length"] = [len(ids) for ids in processed["input_ids"]]
+                processed["label_length"] = [len(ids) for ids in processed["labels"]]
+
+            return processed
 
         logger.info(f"[tabgenie] linearizing tables using {linearize_fn}")
-        lin_example = linearize_fn(self.prepare_table(self.data[split][0]), **linearize_params)
+        lin_example = linearize_fn(self.prepare_cached_table(split, 0), **linearize_params)
         logger.info(f"[tabgenie] linearized example ({split}/0): {lin_example}")
 
-        processed_dataset = self.data[split].map(process_example, batched=False, num_proc=1)
-        extra_columns = [
-            col for col in processed_dataset.features.keys() if col not in ["labels", "input_ids", "attention_mask"]
-        ]
-        processed_dataset = processed_dataset.remove_columns(extra_columns)
+        if mode == "lazy":
+            return self.data[split].with_transform(process_batch)
+
+        fingerprint = self.get_hf_dataset_fingerprint(
+            split,
+            tokenizer,
+            linearize_fn,
+            linearize_params,
+            max_length,
+            with_lengths=with_lengths,
+            packing=packing,
+            # the examples are packed within the batches, so the packed sequences depend on the batch size
+            **({"batch_size": batch_size} if packing else {}),
+        )
+        processed_dataset = self.data[split].map(
+            process_batch,
+            with_indices=True,
+            batched=True,
+            batch_size=batch_size,
+            num_proc=num_proc if num_proc and num_proc > 1 else None,
+            remove_columns=self.data[split].column_names,
+            new_fingerprint=fingerprint,
+            load_from_cache_file=load_from_cache_file,
+            desc=f"Tokenizing {self.name or type(self).__name__}/{split}",
+        )
         processed_dataset.set_format(type="torch")
 
         return processed_dataset
 
+    def get_hf_dataset_fingerprint(self, split, tokenizer, linearize_fn, linearize_params, max_length, **options):
+        """
+        Deterministic fingerprint of the tokenized split. The default fingerprint of HF datasets is not usable,
+        as the processing function is a closure over the whole dataset object.
+        """
+        return datasets.fingerprint.Hasher.hash(
+            [
+                type(self).__name__,
+                split,
+                self.hf_dataset_version,
+                self.get_loader_fingerprint(),
+                getattr(self.data[split], "_fingerprint", None),
+                self._get_fingerprint_arg(linearize_fn),
+                {key: self._get_fingerprint_arg(val) for key, val in sorted(linearize_params.items())},
+                datasets.fingerprint.Hasher.hash(tokenizer),
+                max_length,
+                sorted(options.items()),
+            ]
+        )
+
+    @staticmethod
+    def _get_fingerprint_arg(value):
+        # datasets (and their methods) are identified by the class and the loader, not by their state
+        if isinstance(value, TabularDataset):
+            return f"{type(value).__name__}:{value.get_loader_fingerprint()}"
+
+        if isinstance(getattr(value, "__self__", None), TabularDataset):
+            return f"{TabularDataset._get_fingerprint_arg(value.__self__)}.{value.__name__}"
+
+        return value
+
+    def linearize_split(
+        self,
+        split,
+        styles=("2d", "markers", "index"),
+        props="factual",
+        highlighted_only=False,
+        out_file=None,
+        indices=None,
+        batch_size=256,
+    ):
+        """
+        Linearize the tables of the split in all the `styles` at once (each table is traversed only once).
+
+        Returns a dict style -> list of linearized tables. With `out_file`, the linearizations are written
+        to a JSONL file instead (a line with the table index and a field per style for each table)
+        and the number of tables is returned.
+        """
+        linearized = (
+            (idx, self.table_to_linear_styles(table, styles=styles, props=props, highlighted_only=highlighted_only))
+            for idx, table in self.iter_tables(split, indices, batch_size=batch_size)
+        )
+
+        if out_file is None:
+            out = {style: [] for style in styles}
+
+            for _, table_linearized in linearized:
+                for style in styles:
+                    out[style].append(table_linearized[style])
+
+            return out
+
+        n_tables = 0
+
+        with open(out_file, "w") as f:
+            for idx, table_linearized in linearized:
+                f.write(json.dumps({"table_idx": idx, **table_linearized}) + "\n")
+                n_tables += 1
+
+        return n_tables
+
     def get_linearized_pairs(self, split, linearize_fn=None):
+        return [list(pair) for pair in self.iter_linearized_pairs(split, linearize_fn=linearize_fn)]
+
+    def iter_linearized_pairs(
+        self, split, linearize_fn=None, start=None, stop=None, num_shards=1, shard_idx=0, batch_size=256
+    ):
+        """
+        Iterate over the (input, reference) pairs of the examples in the range `[start, stop)`. The range is split
+        into `num_shards` contiguous shards and only the shard `shard_idx` is iterated over. Each table is prepared
+        once and it is not kept in the table cache.
+        """
         if linearize_fn is None:
             linearize_fn = self.table_to_linear
 
-        data = []
-        for i, entry in enumerate(self.data[split]):
-            ex = [
-                linearize_fn(self.prepare_table(entry)),
-                self.get_reference(self.get_table(split, i)),
-            ]
-            data.append(ex)
+        if not 0 <= shard_idx < num_shards:
+            raise ValueError(f"Shard index {shard_idx} is out of range for {num_shards} shard(s)")
 
-        return data
+        indices = range(self.get_example_count(split))[start:stop]
+        shard_size, remainder = divmod(len(indices), num_shards)
+        shard_start = shard_idx * shard_size + min(shard_idx, remainder)
+        shard_stop = shard_start + shard_size + (shard_idx < remainder)
+
+        for _, table in self.iter_tables(split, indices=indices[shard_start:shard_stop], batch_size=batch_size):
+            yield linearize_fn(table), self.get_reference(table)
 
     def get_task_definition(self):
         # TODO implement for individual datasets
@@ -310,18 +1130,23 @@ class TabularDataset:
 
         return [
             {
-                "in": self.table_to_linear(table_ex_1),
+                "in": self.table_to_linear(table_ex_1, memoize=True),
                 "out": self.get_reference(table_ex_1),
             },
             {
-                "in": self.table_to_linear(table_ex_2),
+                "in": self.table_to_linear(table_ex_2, memoize=True),
                 "out": self.get_reference(table_ex_2),
             },
         ]
 
     # Export methods
-    def table_to_csv(self, table):
-        return export.table_to_csv(table)
+    def table_to_csv(self, table, memoize=False):
+        fn = functools.partial(export.table_to_csv, table)
+
+        if not memoize:
+            return fn()
+
+        return self._memoize(("csv", table.get_fingerprint()), fn)
 
     def table_to_df(self, table):
         return export.table_to_df(table)
@@ -337,6 +1162,9 @@ class TabularDataset:
     def table_to_excel(self, table, include_props=True):
         return export.table_to_excel(table, include_props=include_props)
 
+    def table_to_triples(self, table, cell_ids):
+        return export.table_to_triples(table, cell_ids=cell_ids)
+
     def table_to_linear(
         self,
         table,
@@ -344,8 +1172,14 @@ class TabularDataset:
         props="factual",  # 'all', 'factual', 'none', or list of keys
         style="2d",  # 'index', 'markers', '2d'
         highlighted_only=False,
+        memoize=False,
     ):
-        return export.table_to_linear(
+        """
+        With `memoize`, the output is cached by the table fingerprint and the options, for the tables which are
+        rendered repeatedly (e.g. in prompts). The bulk linearization of a split does not use the cache.
+        """
+        fn = functools.partial(
+            export.table_to_linear,
             table,
             cell_ids=cell_ids,
             props=props,
@@ -353,6 +1187,37 @@ class TabularDataset:
             highlighted_only=highlighted_only,
         )
 
+        if not memoize:
+            return fn()
+
+        key = (
+            "linear",
+            table.get_fingerprint(),
+            # the properties are not a part of the fingerprint, they can be modified after the table is prepared
+            hashlib.blake2b(repr(table.props).encode(), digest_size=16).hexdigest(),
+            tuple(cell_ids) if cell_ids is not None else None,
+            tuple(props) if isinstance(props, list) else props,
+            style,
+            highlighted_only,
+        )
+        return self._memoize(key, fn)
+
+    def table_to_linear_styles(
+        self,
+        table,
+        styles=("2d", "markers", "index"),
+        cell_ids=None,
+        props="factual",  # 'all', 'factual', 'none', or list of keys
+        highlighted_only=False,
+    ):
+        return export.table_to_linear_styles(
+            table,
+            styles=styles,
+            cell_ids=cell_ids,
+            props=props,
+            highlighted_only=highlighted_only,
+        )
+
     # End export methods
 
 
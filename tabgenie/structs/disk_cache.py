@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+import fcntl
+import logging
+import mmap
+import os
+import pickle
+import struct
+
+logger = logging.getLogger(__name__)
+
+
+class DiskTableCache:
+    """
+    Persistent cache of prepared tables for a single dataset split
+
+    The tables are serialized as compact records (see `Table.to_record()`) appended to `tables.bin`,
+    `tables.idx` holds fixed-size entries (table index, offset, length) pointing to the records.
+    Records are read through a memory map of `tables.bin`. Appends are guarded by a file lock,
+    so that the cache can be shared by multiple processes (e.g. gunicorn workers).
+    """
+
+    ENTRY = struct.Struct("<qqq")
+
+    def __init__(self, path, table_cls):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.table_cls = table_cls
+        self.data_path = os.path.join(path, "tables.bin")
+        self.index_path = os.path.join(path, "tables.idx")
+        self.index = {}
+        self._index_bytes_read = 0
+        self._mmap = None
+
+        # make sure both files exist so that they can be opened for reading
+        for filepath in [self.data_path, self.index_path]:
+            open(filepath, "ab").close()
+
+    def __getstate__(self):
+        # memory maps cannot be pickled (e.g. when sending the dataset to worker processes)
+        state = self.__dict__.copy()
+        state["_mmap"] = None
+        return state
+
+    def __len__(self):
+        self._refresh_index()
+        return len(self.index)
+
+    def __contains__(self, table_idx):
+        if table_idx not in self.index:
+            self._refresh_index()
+
+        return table_idx in self.index
+
+    def _refresh_index(self):
+        # read the entries appended since the last refresh (possibly by other processes)
+        with open(self.index_path, "rb") as f:
+            f.seek(self._index_bytes_read)
+            buf = f.read()
+
+        n_entries = len(buf) // self.ENTRY.size
+
+        for table_idx, offset, length in self.ENTRY.iter_unpack(buf[: n_entries * self.ENTRY.size]):
+            self.index[table_idx] = (offset, length)
+
+        self._index_bytes_read += n_entries * self.ENTRY.size
+
+    def _get_mmap(self, min_size):
+        if self._mmap is None or len(self._mmap) < min_size:
+            if self._mmap is not None:
+                self._mmap.close()
+
+            with open(self.data_path, "rb") as f:
+                self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        return self._mmap
+
+    def get(self, table_idx):
+        if table_idx not in self:
+            return None
+
+        offset, length = self.index[table_idx]
+        mm = self._get_mmap(offset + length)
+        record = pickle.loads(mm[offset : offset + length])
+
+        return self.table_cls.from_record(record)
+
+    def put(self, table_idx, table):
+        record = pickle.dumps(table.to_record(), protocol=pickle.HIGHEST_PROTOCOL)
+
+        with open(self.index_path, "ab") as index_f:
+            fcntl.flock(index_f, fcntl.LOCK_EX)
+            try:
+                self._refresh_index()
+
+                if table_idx in self.index:
+                    return
+
+                with open(self.data_path, "ab") as data_f:
+                    offset = data_f.seek(0, os.SEEK_END)
+                    data_f.write(record)
+
+                # the index entry is written only after the record is complete
+                index_f.write(self.ENTRY.pack(table_idx, offset, len(record)))
+                index_f.flush()
+                self.index[table_idx] = (offset, len(record))
+                self._index_bytes_read += self.ENTRY.size
+            finally:
+                fcntl.flock(index_f, fcntl.LOCK_UN)
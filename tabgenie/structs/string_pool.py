@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+import sys
+
+
+class StringPool:
+    """
+    Pool of shared strings used for deduplicating cell values across the tables of a dataset
+
+    Equal strings are replaced by a single pooled instance. Only strings with at most `max_length` characters
+    are pooled (longer values rarely repeat) and the pool stops growing after `max_entries` strings,
+    so that it cannot grow indefinitely.
+    """
+
+    def __init__(self, max_length=64, max_entries=200000):
+        self.max_length = max_length
+        self.max_entries = max_entries
+        self.strings = {}
+        self.requests = 0
+        self.hits = 0
+        self.saved_bytes = 0
+
+    def intern(self, value):
+        if type(value) is not str or len(value) > self.max_length:
+            return value
+
+        self.requests += 1
+        pooled = self.strings.get(value)
+
+        if pooled is None:
+            if len(self.strings) < self.max_entries:
+                self.strings[value] = value
+            return value
+
+        if pooled is not value:
+            self.hits += 1
+            self.saved_bytes += sys.getsizeof(value)
+
+        return pooled
+
+    def get_stats(self):
+        return {
+            "unique": len(self.strings),
+            "requests": self.requests,
+            "hits": self.hits,
+            "dedup_ratio": self.requests / len(self.strings) if self.strings else 1.0,
+            "saved_bytes": self.saved_bytes,
+        }
+
+    def __len__(self):
+        return len(self.strings)
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+
+"""
+Export of whole splits to columnar files (Parquet or Arrow IPC).
+"""
+
+COLUMNAR_FORMATS = {"parquet": "parquet", "arrow": "arrow"}  # format -> file extension
+
+CELL_TYPE = pa.struct(
+    [
+        ("idx", pa.int32()),
+        ("value", pa.string()),
+        ("colspan", pa.int32()),
+        ("rowspan", pa.int32()),
+        ("is_highlighted", pa.bool_()),
+        ("is_col_header", pa.bool_()),
+        ("is_row_header", pa.bool_()),
+        ("is_dummy", pa.bool_()),
+        ("main_cell", pa.list_(pa.int32())),
+    ]
+)
+
+
+def get_schema(styles):
+    """
+    Schema of the exported tables: table index, linearization in each of the `styles`, reference,
+    properties serialized as JSON and the rows of cells (mirroring `table_to_json()`).
+    """
+    return pa.schema(
+        [("table_idx", pa.int64())]
+        + [(f"linearized_{style}", pa.string()) for style in styles]
+        + [
+            ("reference", pa.string()),
+            ("props", pa.string()),
+            ("cells", pa.list_(pa.list_(CELL_TYPE))),
+        ]
+    )
+
+
+def write_columnar_file(rows, out_file, schema, file_format="parquet", batch_size=1000):
+    """
+    Write the rows (dicts with the columns of `schema`) to a Parquet or Arrow IPC file,
+    one record batch of `batch_size` rows at a time.
+    """
+    if file_format == "parquet":
+        writer = pq.ParquetWriter(out_file, schema)
+    elif file_format == "arrow":
+        writer = pa.ipc.new_file(out_file, schema)
+    else:
+        raise NotImplementedError(
+            f"{file_format} columnar format is not recognized. Available options: {list(COLUMNAR_FORMATS)}."
+        )
+
+    n_rows = 0
+
+    with writer:
+        batch = []
+
+        for row in rows:
+            batch.append(row)
+
+            if len(batch) == batch_size:
+                writer.write_batch(pa.RecordBatch.from_pylist(batch, schema=schema))
+                n_rows += len(batch)
+                batch = []
+
+        if batch or n_rows == 0:
+            writer.write_batch(pa.RecordBatch.from_pylist(batch, schema=schema))
+            n_rows += len(batch)
+
+    return n_rows
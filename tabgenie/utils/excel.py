@@ -108,6 +108,128 @@ def write_html_table_to_excel(
     return row_num
 
 
+def _to_cell_value(value):
+    # xlsxwriter writes only scalar values, the other values (lists, tuples, dicts) are written as strings
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+
+    return str(value)
+
+
+def write_table_rows_to_excel(table, worksheet, style_objs, start_row=0, start_col=0, write_table_props=False):
+    """
+    Write the table strictly row by row, as required by the `constant_memory` mode of xlsxwriter.
+    Cells spanning multiple columns are merged, the positions covered by cells spanning multiple rows
+    are filled with formatted blank cells (merging them would require writing to the following rows in advance).
+    :return: int: the row following the table
+    """
+    row_num = start_row
+
+    if write_table_props:
+        worksheet.write(row_num, start_col, "properties", style_objs["bold"])
+        row_num += 1
+
+        for prop_name in table.props.keys():
+            worksheet.write(row_num, start_col, prop_name, style_objs["bold"])
+            worksheet.write(row_num, start_col + 1, _to_cell_value(table.props.get(prop_name, "")))
+            row_num += 1
+
+        worksheet.write(row_num + 1, start_col, "data", style_objs["bold"])
+        row_num += 2
+
+    # row -> {column: format} for the positions covered by the cells from the previous rows
+    covered = {}
+
+    for row in table.get_cells():
+        row_covered = covered.pop(row_num, {})
+        col_num = start_col
+
+        for cell in row:
+            if cell.is_dummy:
+                continue
+
+            while col_num in row_covered:
+                col_num += 1
+
+            style_key = "data_table"
+            if cell.is_col_header or cell.is_row_header:
+                style_key += "_header"
+            if cell.is_highlighted:
+                style_key += "_active"
+            cell_format = style_objs[style_key]
+
+            if cell.colspan > 1:
+                end_col = col_num + cell.colspan - 1
+                worksheet.merge_range(row_num, col_num, row_num, end_col, str(cell.value), cell_format)
+            else:
+                worksheet.write(row_num, col_num, str(cell.value), cell_format)
+
+            for r in range(row_num + 1, row_num + cell.rowspan):
+                for c in range(col_num, col_num + cell.colspan):
+                    covered.setdefault(r, {})[c] = cell_format
+
+            col_num += cell.colspan
+
+        for c, cell_format in row_covered.items():
+            worksheet.write_blank(row_num, c, None, cell_format)
+
+        row_num += 1
+
+    # cells spanning over the last row of the table
+    for r in sorted(covered):
+        for c, cell_format in covered[r].items():
+            worksheet.write_blank(r, c, None, cell_format)
+        row_num = r + 1
+
+    return row_num
+
+
+def write_tables_to_excel(tables, out_file, layout="sheets", write_table_props=True):
+    """
+    Write multiple tables into a single workbook in the `constant_memory` mode of xlsxwriter,
+    so that the memory footprint does not grow with the number of tables.
+    :param tables: Iterable[Tuple[str, Table]]: pairs of the table name and the `Table` object
+    :param layout: str: "sheets" for a separate sheet for each table, "stacked" for all the tables
+                        on a single sheet (better for many tables), with an index sheet linking to the tables
+    :param write_table_props: bool: write the table properties above each table
+    :param out_file: str: path for output file
+    :return: None, results are written in the file
+    """
+    if layout not in ["sheets", "stacked"]:
+        raise ValueError(f'Unknown layout: {layout}, available options: "sheets", "stacked".')
+
+    workbook = Workbook(out_file, {"constant_memory": True})
+    style_objs = {k: workbook.add_format(v) for k, v in STYLES.items()}
+
+    if layout == "stacked":
+        index_sheet = workbook.add_worksheet("index")
+        index_sheet.write_row(0, 0, ["table", "row"], style_objs["ann_table_header"])
+        worksheet = workbook.add_worksheet("tables")
+        start_row = 0
+
+    sheet_names = set()
+
+    for i, (name, table) in enumerate(tables):
+        if layout == "sheets":
+            # sheet names are limited to 31 characters and must be unique
+            sheet_name = name[:31] if name[:31] not in sheet_names else f"table_{i}"
+            sheet_names.add(sheet_name)
+
+            worksheet = workbook.add_worksheet(sheet_name)
+            write_table_rows_to_excel(table, worksheet, style_objs, write_table_props=write_table_props)
+        else:
+            index_sheet.write(i + 1, 0, name)
+            index_sheet.write_url(i + 1, 1, f"internal:tables!A{start_row + 1}", string=str(start_row + 1))
+
+            worksheet.write(start_row, 0, name, style_objs["ann_table_delim"])
+            end_row = write_table_rows_to_excel(
+                table, worksheet, style_objs, start_row=start_row + 1, write_table_props=write_table_props
+            )
+            start_row = end_row + 1
+
+    workbook.close()
+
+
 def write_annotation_to_excel(tables, prop_list, ann_columns, out_file):
     """
     Write multiple tables to excel for manual annotation.
@@ -1,9 +1,14 @@
 #!/usr/bin/env python3
+import csv
+import html
+import io
+import re
+
 import pandas as pd
 import lxml.etree
 import lxml.html
 
-from tinyhtml import h
+from tinyhtml import render
 from xlsxwriter import Workbook
 from .excel import write_html_table_to_excel
 
@@ -29,7 +34,7 @@ def table_to_triples(table, cell_ids):
 
     for i, row in enumerate(table.get_cells()):
         for j, cell in enumerate(row):
-            if cell.is_header():
+            if cell.is_header:
                 continue
 
             row_headers = table.get_row_headers(i, j)
@@ -47,6 +52,10 @@ def table_to_triples(table, cell_ids):
                 subj = title
                 pred = col_headers[0].value
 
+            else:
+                # no header to use as a predicate
+                continue
+
             obj = cell.value
             triples.append([subj, pred, obj])
 
@@ -61,36 +70,146 @@ def table_to_excel(table, include_props=True):
     return workbook
 
 
+def workbook_to_bytes(workbook):
+    buf = io.BytesIO()
+    workbook.filename = buf
+    workbook.close()
+
+    return buf.getvalue()
+
+
 def table_to_csv(table):
-    df = table_to_df(table)
+    out = io.StringIO()
+    write_table_csv(table, out)
+
+    return out.getvalue()
+
 
-    # export headers only if they are not the default integer index
-    export_headers = (type(df.columns) == pd.core.indexes.base.Index)
+def write_table_csv(table, f):
+    header_rows, body_rows = get_table_grid(table)
+    writer = csv.writer(f, lineterminator="\n")
 
-    table_csv = df.to_csv(index=False, header=export_headers)
-    return table_csv
+    # export headers only if there is a single header row (i.e. they are not a multi-level header)
+    if len(header_rows) == 1:
+        writer.writerow(header_rows[0])
+
+    writer.writerows(body_rows)
 
 
 def table_to_df(table):
-    table_el = _get_main_table_html(table)
-    table_html = table_el.render()
-    df = pd.read_html(table_html)[0]
-    return df
+    header_rows, body_rows = get_table_grid(table)
+
+    if len(header_rows) == 1:
+        columns = header_rows[0]
+    elif len(header_rows) > 1:
+        columns = pd.MultiIndex.from_arrays(header_rows)
+    else:
+        columns = None
+
+    return pd.DataFrame(body_rows, columns=columns)
+
+
+def get_table_grid(table):
+    """
+    Cell texts laid out in a grid with the cells spanning multiple rows or columns copied to all the positions
+    they cover (the layout of the HTML table as parsed by `pd.read_html`).
+
+    Returns a tuple (header rows, body rows), the header rows are the leading rows consisting only of header cells.
+    All the rows are padded to the same length, empty body rows are skipped.
+    """
+    rows = [[c for c in row if not c.is_dummy] for row in table.get_cells()]
+
+    n_header_rows = 0
+    while n_header_rows < len(rows) and all(c.is_header for c in rows[n_header_rows]):
+        n_header_rows += 1
+
+    header_rows = _expand_spans(rows[:n_header_rows])
+    body_rows = [row for row in _expand_spans(rows[n_header_rows:]) if any(row)]
+    n_cols = max((len(row) for row in header_rows + body_rows), default=0)
+
+    return [_pad_row(row, n_cols) for row in header_rows], [_pad_row(row, n_cols) for row in body_rows]
+
+
+def _expand_spans(rows):
+    grid = []
+    # (column index, text, remaining rows) for the cells spanning to the next rows
+    remainder = []
 
+    for row in rows:
+        texts = []
+        next_remainder = []
 
-def table_to_html(table, displayed_props, include_props, html_format):
+        for c in row:
+            while remainder and remainder[0][0] <= len(texts):
+                prev_j, prev_text, prev_rowspan = remainder.pop(0)
+                texts.append(prev_text)
+                if prev_rowspan > 1:
+                    next_remainder.append((prev_j, prev_text, prev_rowspan - 1))
+
+            text = _cell_text(c.value)
+            rowspan = int(c.rowspan or 1)
+
+            for _ in range(int(c.colspan or 1)):
+                if rowspan > 1:
+                    next_remainder.append((len(texts), text, rowspan - 1))
+                texts.append(text)
+
+        for prev_j, prev_text, prev_rowspan in remainder:
+            texts.append(prev_text)
+            if prev_rowspan > 1:
+                next_remainder.append((prev_j, prev_text, prev_rowspan - 1))
+
+        grid.append(texts)
+        remainder = next_remainder
+
+    # rows consisting only of the cells spanning over the end of the table
+    while remainder:
+        grid.append([text for _, text, _ in remainder])
+        remainder = [(j, text, rowspan - 1) for j, text, rowspan in remainder if rowspan > 1]
+
+    return grid
+
+
+_RE_TAG = re.compile(r"<[^>]*>")
+_RE_WHITESPACE = re.compile(r"[\r\n]+|\s{2,}")
+
+
+def _cell_text(value):
+    # non-string values (numbers, HTML fragments) are converted to the text which would be displayed in HTML
+    text = value if isinstance(value, str) else html.unescape(_RE_TAG.sub("", render(value)))
+
+    return _RE_WHITESPACE.sub(" ", text.strip())
+
+
+def _pad_row(row, n_cols):
+    return row + [""] * (n_cols - len(row))
+
+
+def table_to_html(table, displayed_props, include_props, html_format, pretty_print=None):
+    """
+    Render the table to HTML in a single pass. The output is pretty-printed only for the export
+    (`html_format="export"`) unless `pretty_print` is set explicitly.
+    """
     if html_format == "web" and table.props is not None:
-        meta_el = _meta_to_html(table.props, displayed_props)
+        meta_html = _meta_to_html(table.props, displayed_props)
     elif html_format == "export" and include_props and table.props is not None:
-        meta_el = _meta_to_simple_html(table.props)
+        meta_html = _meta_to_simple_html(table.props)
     else:
-        meta_el = None
+        meta_html = ""
+
+    table_html = "<div>" + meta_html + _get_main_table_html(table) + "</div>"
+
+    if pretty_print is None:
+        pretty_print = html_format == "export"
+
+    if pretty_print:
+        return pretty_print_html(table_html)
 
-    table_el = _get_main_table_html(table)
-    area_el = h("div")(meta_el, table_el)
+    return table_html
 
-    html = area_el.render()
-    return lxml.etree.tostring(lxml.html.fromstring(html), encoding="unicode", pretty_print=True)
+
+def pretty_print_html(html_str):
+    return lxml.etree.tostring(lxml.html.fromstring(html_str), encoding="unicode", pretty_print=True)
 
 
 def select_props(table, props):
@@ -118,49 +237,71 @@ def select_cells(table, highlighted_only, cell_ids):
         return table.get_cells()
 
 
-def table_to_2d_str(cells, props):
-    prop_tokens = [f"{key}: {val}" for key, val in props.items()]
-    prop_str = "===\n" + "\n".join(prop_tokens) + "\n===\n"
-
-    cell_tokens = []
-    for i, row in enumerate(cells):
-        for j, cell in enumerate(row):
-            if cell.is_dummy:
-                continue
+LINEARIZATION_STYLES = ["2d", "markers", "index"]
 
-            cell_tokens.append(f"| {cell.value} ")
-        cell_tokens.append(f"|\n")
-    cell_str = "".join(cell_tokens).strip()
 
-    return prop_str + cell_str
+def table_to_2d_str(cells, props):
+    return cells_to_linear(cells, props, ["2d"])["2d"]
 
 
 def table_to_markers_str(cells, props):
-    tokens = [f"[P] {key}: {val}" for key, val in props.items()]
+    return cells_to_linear(cells, props, ["markers"])["markers"]
+
+
+def table_to_indexed_str(cells, props):
+    return cells_to_linear(cells, props, ["index"])["index"]
+
+
+def cells_to_linear(cells, props, styles):
+    """
+    Linearize the cells in any subset of the linearization `styles` with a single pass over the cells.
+    Returns a dict style -> linearized string.
+    """
+    for style in styles:
+        if style not in LINEARIZATION_STYLES:
+            raise NotImplementedError(
+                f"{style} linearization style is not recognized. " f'Available options: "index", "markers", or "2d".'
+            )
+
+    is_2d, is_markers, is_index = [style in styles for style in LINEARIZATION_STYLES]
+    cell_tokens_2d = []
+    prop_tokens = [f"[P] {key}: {val}" for key, val in props.items()] if is_markers or is_index else []
+    tokens_markers = list(prop_tokens)
+    tokens_index = list(prop_tokens)
 
     for i, row in enumerate(cells):
-        tokens.append("[R]")
+        if is_markers:
+            tokens_markers.append("[R]")
 
         for j, cell in enumerate(row):
             if cell.is_dummy:
                 continue
 
-            tokens.append("[H]" if cell.is_header else "[C]")
-            tokens.append(cell.value)
+            value = cell.value
 
-    return " ".join(tokens)
+            if is_2d:
+                cell_tokens_2d.append(f"| {value} ")
+            if is_markers:
+                tokens_markers.append("[H]" if cell.is_header else "[C]")
+                tokens_markers.append(value)
+            if is_index:
+                tokens_index.append(f"[{i}][{j}]")
+                tokens_index.append(value)
 
+        if is_2d:
+            cell_tokens_2d.append("|\n")
 
-def table_to_indexed_str(cells, props):
-    tokens = [f"[P] {key}: {val}" for key, val in props.items()]
-    for i, row in enumerate(cells):
-        for j, cell in enumerate(row):
-            if cell.is_dummy:
-                continue
+    out = {}
+
+    if is_2d:
+        prop_str = "===\n" + "\n".join(f"{key}: {val}" for key, val in props.items()) + "\n===\n"
+        out["2d"] = prop_str + "".join(cell_tokens_2d).strip()
+    if is_markers:
+        out["markers"] = " ".join(tokens_markers)
+    if is_index:
+        out["index"] = " ".join(tokens_index)
 
-            tokens.append(f"[{i}][{j}]")
-            tokens.append(cell.value)
-    return " ".join(tokens)
+    return out
 
 
 def table_to_linear(
@@ -170,84 +311,97 @@ def table_to_linear(
     style="2d",  # 'index', 'markers', '2d'
     highlighted_only=False,
 ):
+    linearized = table_to_linear_styles(
+        table, [style], cell_ids=cell_ids, props=props, highlighted_only=highlighted_only
+    )
+    return linearized[style]
+
+
+def table_to_linear_styles(
+    table,
+    styles=("2d", "markers", "index"),
+    cell_ids=None,
+    props="factual",  # 'all', 'factual', 'none', or list of keys
+    highlighted_only=False,
+):
+    """
+    Linearize the table in multiple styles at once, the cells and properties are selected only once.
+    Returns a dict style -> linearized string.
+    """
     props_to_include = select_props(table, props)
     cells_to_include = select_cells(table, highlighted_only, cell_ids)
 
-    if style == "2d":
-        return table_to_2d_str(cells_to_include, props_to_include)
-    elif style == "markers":
-        return table_to_markers_str(cells_to_include, props_to_include)
-    elif style == "index":
-        return table_to_indexed_str(cells_to_include, props_to_include)
-    else:
-        raise NotImplementedError(
-            f"{style} linearization style is not recognized. " f'Available options: "index", "markers", or "2d".'
-        )
+    return cells_to_linear(cells_to_include, props_to_include, styles)
+
+
+def _html_text(value):
+    # the same escaping as in tinyhtml, non-string values (e.g. tinyhtml elements) are rendered
+    return html.escape(value, quote=False) if isinstance(value, str) else render(value)
+
+
+def _html_attr(value):
+    return html.escape(str(value), quote=False).replace('"', "&quot;")
 
 
 def _meta_to_html(props, displayed_props):
-    meta_tbodies = []
+    meta_trs = []
     meta_buttons = []
 
     for key, value in props.items():
         meta_row_cls = "collapse show" if key in displayed_props else "collapse"
         aria_expanded = "true" if key in displayed_props else "false"
+        row_cls = _html_attr(f"row_{key}")
 
         # two wrappers around text required for collapsing
-        wrapper = h("div", klass=[meta_row_cls, f"row_{key}", "collapsible"])
-        cells = [h("th")(wrapper(h("div")(key))), h("td")(wrapper(h("div")(value)))]
-
-        meta_tbodies.append(h("tr")(cells))
+        wrapper = f'<div class="{meta_row_cls} {row_cls} collapsible"><div>'
+        meta_trs.append(
+            f"<tr><th>{wrapper}{_html_text(key)}</div></div></th><td>{wrapper}{_html_text(value)}</div></div></td></tr>"
+        )
         meta_buttons.append(
-            h(
-                "button",
-                type_="button",
-                klass="prop-btn btn btn-outline-primary btn-sm",
-                data_bs_toggle="collapse",
-                data_bs_target=f".row_{key}",
-                aria_expanded=aria_expanded,
-                aria_controls=f"row_{key}",
-            )(key)
+            '<button type="button" class="prop-btn btn btn-outline-primary btn-sm" data-bs-toggle="collapse" '
+            f'data-bs-target=".{row_cls}" aria-expanded="{aria_expanded}" aria-controls="{row_cls}">'
+            f"{_html_text(key)}</button>"
         )
 
-    prop_caption = h("div", id_="prop-caption")("properties")
-    meta_buttons_div = h("div", klass="prop-buttons")(meta_buttons)
-    meta_tbody_el = h("tbody")(meta_tbodies)
-    meta_table_el = h("table", klass="table table-sm table-borderless caption-top meta-table")(meta_tbody_el)
-    meta_el = h("div")(prop_caption, meta_buttons_div, meta_table_el)
-    return meta_el
+    return (
+        '<div><div id="prop-caption">properties</div>'
+        f'<div class="prop-buttons">{"".join(meta_buttons)}</div>'
+        '<table class="table table-sm table-borderless caption-top meta-table">'
+        f'<tbody>{"".join(meta_trs)}</tbody></table></div>'
+    )
 
 
 def _meta_to_simple_html(props):
-    meta_trs = []
-    for key, value in props.items():
-        meta_trs.append([h("th")(key), h("td")(value)])
+    meta_trs = [f"<tr><th>{_html_text(key)}</th><td>{_html_text(value)}</td></tr>" for key, value in props.items()]
 
-    meta_tbodies = [h("tr")(tds) for tds in meta_trs]
-    meta_tbody_el = h("tbody")(meta_tbodies)
-    meta_table_el = h("table", klass="table table-sm caption-top meta-table")(h("caption")("properties"), meta_tbody_el)
-    return meta_table_el
+    return (
+        '<table class="table table-sm caption-top meta-table"><caption>properties</caption>'
+        f'<tbody>{"".join(meta_trs)}</tbody></table>'
+    )
 
 
 def _get_main_table_html(table):
-    trs = []
-    for row in table.cells:
-        tds = []
+    parts = [
+        '<table class="table table-sm table-bordered caption-top main-table"><caption>data</caption>'
+        '<tbody id="main-table-body">'
+    ]
+
+    for row in table.get_cells():
+        parts.append("<tr>")
+
         for c in row:
             if c.is_dummy:
                 continue
 
             eltype = "th" if c.is_header else "td"
-            td_el = h(eltype, colspan=c.colspan, rowspan=c.rowspan, cell_idx=c.idx)(c.value)
-
-            if c.is_highlighted:
-                td_el.tag.attrs["class"] = "table-active"
+            active = ' class="table-active"' if c.is_highlighted else ""
+            parts.append(
+                f'<{eltype} colspan="{c.colspan}" rowspan="{c.rowspan}" cell-idx="{c.idx}"{active}>'
+                f"{_html_text(c.value)}</{eltype}>"
+            )
 
-            tds.append(td_el)
-        trs.append(tds)
+        parts.append("</tr>")
 
-    tbodies = [h("tr")(tds) for tds in trs]
-    tbody_el = h("tbody", id="main-table-body")(tbodies)
-    table_el = h("table", klass="table table-sm table-bordered caption-top main-table")(h("caption")("data"), tbody_el)
+    parts.append("</tbody></table>")
 
-    return table_el
+    return "".join(parts)
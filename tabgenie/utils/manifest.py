@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+import hashlib
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+def checksum_files(paths):
+    h = hashlib.sha256()
+
+    for path in paths:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+
+    return h.hexdigest()
+
+
+def checksum_file_range(path, start, end):
+    h = hashlib.sha256()
+
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start
+
+        while remaining > 0:
+            block = f.read(min(remaining, 1 << 20))
+            if not block:
+                break
+            h.update(block)
+            remaining -= len(block)
+
+    return h.hexdigest()
+
+
+class ExportManifest:
+    """
+    Manifest of a resumable export, stored as JSON next to the exported files
+
+    The header identifies the export (dataset, split, loader fingerprint, format, options). The chunks
+    list the completed ranges of the exported tables with the checksums of their output. If the header
+    of an existing manifest does not match, the export starts from scratch.
+    """
+
+    def __init__(self, path, header):
+        self.path = path
+        # normalized to the JSON types, so that it can be compared with the loaded header
+        self.header = json.loads(json.dumps(header))
+        self.chunks = []
+
+        if os.path.exists(path):
+            with open(path) as f:
+                manifest = json.load(f)
+
+            if manifest.get("header") == self.header:
+                self.chunks = manifest["chunks"]
+            else:
+                logger.info(f"The export settings differ from {path}, starting the export from scratch")
+
+    def __len__(self):
+        return len(self.chunks)
+
+    def verify(self, checksum_fn):
+        """
+        Keep only the chunks up to the first chunk whose output is missing or does not match the checksum.
+        `checksum_fn(chunk)` returns the current checksum of the chunk output (or None if it is missing).
+        """
+        for i, chunk in enumerate(self.chunks):
+            if checksum_fn(chunk) != chunk["checksum"]:
+                logger.warning(f"The output of the chunk {chunk['start']}-{chunk['end']} is corrupted, exporting again")
+                self.chunks = self.chunks[:i]
+                break
+
+        if self.chunks:
+            logger.info(f"Resuming the export: {len(self.chunks)} chunk(s) already completed")
+
+    def add_chunk(self, start, end, checksum, **kwargs):
+        self.chunks.append({"start": start, "end": end, "checksum": checksum, **kwargs})
+        self.save()
+
+    def save(self):
+        # write to a temporary file first, so that an interruption does not leave a broken manifest
+        tmp_path = self.path + ".tmp"
+
+        with open(tmp_path, "w") as f:
+            json.dump({"header": self.header, "chunks": self.chunks}, f, indent=2)
+
+        os.replace(tmp_path, self.path)
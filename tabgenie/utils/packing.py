@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+import numpy as np
+
+
+def _to_list(seq):
+    # the sequences can be also rows of a dataset formatted as tensors
+    return [int(x) for x in seq]
+
+
+def pack_examples(input_ids, labels, example_ids, max_length, max_label_length=None):
+    """
+    Pack the tokenized examples into sequences of at most `max_length` input tokens and `max_label_length` label tokens.
+    Each example is added to the first sequence it fits in (in the order of the examples).
+
+    Returns the columns `input_ids` and `labels` with the concatenated examples, `segment_ids` and `label_segment_ids`
+    with the position of the example in the sequence for each token (starting from 1) and `example_ids`.
+    """
+    if max_label_length is None:
+        max_label_length = max_length
+
+    packs = []
+
+    for i, (inp, lab) in enumerate(zip(input_ids, labels)):
+        for pack in packs:
+            if pack["input_length"] + len(inp) <= max_length and pack["label_length"] + len(lab) <= max_label_length:
+                break
+        else:
+            pack = {"input_length": 0, "label_length": 0, "members": []}
+            packs.append(pack)
+
+        pack["input_length"] += len(inp)
+        pack["label_length"] += len(lab)
+        pack["members"].append(i)
+
+    packed = {key: [] for key in ["input_ids", "labels", "segment_ids", "label_segment_ids", "example_ids"]}
+
+    for pack in packs:
+        members = pack["members"]
+        packed["input_ids"].append([token for i in members for token in input_ids[i]])
+        packed["labels"].append([token for i in members for token in labels[i]])
+        packed["segment_ids"].append([seg for seg, i in enumerate(members, start=1) for _ in input_ids[i]])
+        packed["label_segment_ids"].append([seg for seg, i in enumerate(members, start=1) for _ in labels[i]])
+        packed["example_ids"].append([example_ids[i] for i in members])
+
+    return packed
+
+
+def unpack_predictions(predictions, label_segment_ids, example_ids):
+    """
+    Split the predictions for the packed sequences back to the individual examples. The predictions have to be
+    aligned with the labels (e.g. the argmax of the logits from `packed_seq2seq_forward()`). The outputs cannot
+    be generated for the packed sequences, the generation has to run on the examples which are not packed.
+    Returns the list of predicted token ids for each example, ordered by the example ids.
+    """
+    unpacked = {}
+
+    for preds, segments, ids in zip(predictions, label_segment_ids, example_ids):
+        preds = _to_list(preds)
+        segments = _to_list(segments)
+
+        for seg, example_id in enumerate(_to_list(ids), start=1):
+            unpacked[example_id] = [pred for pred, pred_seg in zip(preds, segments) if pred_seg == seg]
+
+    return [unpacked[example_id] for example_id in sorted(unpacked)]
+
+
+class PackedSeq2SeqCollator:
+    """
+    Data collator for the packed sequences produced by `pack_examples()`
+
+    Pads the sequences and builds the decoder inputs by shifting the labels within each segment, so that every
+    example starts with `decoder_start_token_id`. The examples without the segment columns are treated as
+    sequences with a single segment.
+
+    The tokens attend only to the tokens of the same example: `attention_mask` (encoder, batch x src x src),
+    `decoder_attention_mask` (causal, batch x tgt x tgt) and `cross_attention_mask` (batch x tgt x src) are 3D masks.
+    The stock HF seq2seq models take only 2D padding masks and use the same mask for the encoder and
+    the cross-attention, the batches are passed to the model by `packed_seq2seq_forward()`.
+    """
+
+    def __init__(self, pad_token_id, decoder_start_token_id, label_pad_token_id=-100, return_tensors="pt"):
+        self.pad_token_id = pad_token_id
+        self.decoder_start_token_id = decoder_start_token_id
+        self.label_pad_token_id = label_pad_token_id
+        self.return_tensors = return_tensors
+
+    def __call__(self, features):
+        n = len(features)
+        src_len = max(len(f["input_ids"]) for f in features)
+        tgt_len = max(len(f["labels"]) for f in features)
+
+        input_ids = np.full((n, src_len), self.pad_token_id, dtype=np.int64)
+        labels = np.full((n, tgt_len), self.label_pad_token_id, dtype=np.int64)
+        decoder_input_ids = np.full((n, tgt_len), self.pad_token_id, dtype=np.int64)
+        segments = np.zeros((n, src_len), dtype=np.int64)
+        label_segments = np.zeros((n, tgt_len), dtype=np.int64)
+
+        for i, f in enumerate(features):
+            inp = _to_list(f["input_ids"])
+            lab = _to_list(f["labels"])
+            seg = _to_list(f["segment_ids"]) if "segment_ids" in f else [1] * len(inp)
+            lab_seg = _to_list(f["label_segment_ids"]) if "label_segment_ids" in f else [1] * len(lab)
+
+            input_ids[i, : len(inp)] = inp
+            segments[i, : len(inp)] = seg
+            labels[i, : len(lab)] = lab
+            label_segments[i, : len(lab)] = lab_seg
+
+            if lab:
+                # shift the labels right, restarting at the beginning of each segment
+                shifted = np.array([self.decoder_start_token_id] + lab[:-1], dtype=np.int64)
+                shifted[np.flatnonzero(np.diff(lab_seg)) + 1] = self.decoder_start_token_id
+                decoder_input_ids[i, : len(lab)] = shifted
+
+        causal = np.tril(np.ones((tgt_len, tgt_len), dtype=bool))
+        batch = {
+            "input_ids": input_ids,
+            "labels": labels,
+            "decoder_input_ids": decoder_input_ids,
+            "attention_mask": _same_segment(segments, segments).astype(np.int64),
+            "decoder_attention_mask": (_same_segment(label_segments, label_segments) & causal).astype(np.int64),
+            "cross_attention_mask": _same_segment(label_segments, segments).astype(np.int64),
+        }
+
+        if self.return_tensors == "pt":
+            import torch
+
+            batch = {key: torch.from_numpy(val) for key, val in batch.items()}
+
+        return batch
+
+
+def _same_segment(query_segments, key_segments):
+    return (query_segments[:, :, None] == key_segments[:, None, :]) & (query_segments[:, :, None] > 0)
+
+
+# models with relative position biases: the biases depend only on the distances between the tokens, which are
+# the same within a segment of a packed sequence as in the separate example, so the positions need no reset
+PACKING_MODEL_TYPES = ["t5", "mt5"]
+
+
+def packed_seq2seq_forward(
+    model,
+    input_ids,
+    attention_mask,
+    decoder_input_ids,
+    decoder_attention_mask,
+    cross_attention_mask,
+    labels=None,
+):
+    """
+    Run a T5 model (e.g. `T5ForConditionalGeneration`) on a batch from `PackedSeq2SeqCollator`.
+
+    The 3D masks are passed separately to the encoder self-attention, the decoder self-attention and the
+    cross-attention, so that each example in a packed sequence is processed the same as on its own. The models
+    with absolute position embeddings (e.g. BART) are not supported, see `PACKING_MODEL_TYPES`. Requires
+    `transformers` 5, which accepts the prepared 4D attention masks. Returns the output of the model
+    (the logits and the loss if `labels` are given).
+    """
+    import transformers
+
+    if model.config.model_type not in PACKING_MODEL_TYPES:
+        raise ValueError(
+            f'Packed batches are not supported for the model type "{model.config.model_type}", '
+            f"supported types: {PACKING_MODEL_TYPES}"
+        )
+
+    if int(transformers.__version__.split(".")[0]) < 5:
+        raise RuntimeError(f"Packed batches require transformers>=5, found {transformers.__version__}")
+
+    dtype = model.get_input_embeddings().weight.dtype
+    encoder_outputs = model.get_encoder()(input_ids=input_ids, attention_mask=_to_attention_bias(attention_mask, dtype))
+
+    # with `encoder_outputs`, the model uses `attention_mask` only as the mask of the cross-attention
+    return model(
+        encoder_outputs=encoder_outputs,
+        attention_mask=_to_attention_bias(cross_attention_mask, dtype),
+        decoder_input_ids=decoder_input_ids,
+        decoder_attention_mask=_to_attention_bias(decoder_attention_mask, dtype),
+        labels=labels,
+    )
+
+
+def _to_attention_bias(mask, dtype):
+    # 3D mask (1 = attend) -> 4D additive mask broadcast over the attention heads
+    import torch
+
+    return (1.0 - mask[:, None, :, :].to(dtype)) * torch.finfo(dtype).min
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+import random
+
+
+def _to_list(lengths):
+    # the lengths can be also a column of a dataset formatted as tensors
+    return [int(length) for length in lengths]
+
+
+def get_length_grouped_indices(lengths, batch_size, mega_batch_mult=50, seed=None):
+    """
+    Order the examples so that the consecutive batches of `batch_size` examples have similar lengths. The indices
+    are shuffled, split into mega-batches of `mega_batch_mult * batch_size` examples and sorted by length within
+    each mega-batch, so that the order stays random across the epoch. The longest example is moved to the first batch,
+    so that running out of memory shows up immediately.
+    """
+    lengths = _to_list(lengths)
+    indices = list(range(len(lengths)))
+    random.Random(seed).shuffle(indices)
+
+    mega_batch_size = mega_batch_mult * batch_size
+    mega_batches = [
+        sorted(indices[start : start + mega_batch_size], key=lambda idx: lengths[idx], reverse=True)
+        for start in range(0, len(indices), mega_batch_size)
+    ]
+
+    if mega_batches:
+        longest = max(range(len(mega_batches)), key=lambda i: lengths[mega_batches[i][0]])
+        mega_batches[0][0], mega_batches[longest][0] = mega_batches[longest][0], mega_batches[0][0]
+
+    return [idx for mega_batch in mega_batches for idx in mega_batch]
+
+
+def get_length_sorted_indices(lengths, descending=True):
+    """
+    Deterministic order of the examples by length, e.g. for prediction. The outputs can be put back
+    to the original order with `restore_order()`.
+    """
+    lengths = _to_list(lengths)
+
+    return sorted(range(len(lengths)), key=lambda idx: lengths[idx], reverse=descending)
+
+
+def restore_order(items, indices):
+    """
+    Put the items produced for the examples in the order of `indices` back to the original order.
+    """
+    restored = [None] * len(indices)
+
+    for idx, item in zip(indices, items):
+        restored[idx] = item
+
+    return restored
+
+
+class LengthGroupedBatchSampler:
+    """
+    Batch sampler yielding the indices of examples with similar lengths
+
+    Can be used as the `batch_sampler` of a PyTorch `DataLoader`. With `shuffle=True`, the batches are ordered
+    by `get_length_grouped_indices()` with a new seed in each epoch (see `set_epoch()`), otherwise the examples
+    are sorted by length.
+    """
+
+    def __init__(self, lengths, batch_size, mega_batch_mult=50, shuffle=True, drop_last=False, seed=0):
+        self.lengths = _to_list(lengths)
+        self.batch_size = batch_size
+        self.mega_batch_mult = mega_batch_mult
+        self.shuffle = shuffle
+        self.drop_last = drop_last
+        self.seed = seed
+        self.epoch = 0
+
+    def set_epoch(self, epoch):
+        self.epoch = epoch
+
+    def __iter__(self):
+        if self.shuffle:
+            indices = get_length_grouped_indices(
+                self.lengths, self.batch_size, mega_batch_mult=self.mega_batch_mult, seed=self.seed + self.epoch
+            )
+        else:
+            indices = get_length_sorted_indices(self.lengths)
+
+        for start in range(0, len(indices), self.batch_size):
+            batch = indices[start : start + self.batch_size]
+
+            if len(batch) < self.batch_size and self.drop_last:
+                break
+
+            yield batch
+
+    def __len__(self):
+        if self.drop_last:
+            return len(self.lengths) // self.batch_size
+
+        return (len(self.lengths) + self.batch_size - 1) // self.batch_size